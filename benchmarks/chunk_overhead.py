@@ -0,0 +1,76 @@
+""" measures the CPU time the parent spends per chunk of output, with and without output logging, and the cost of
+the per-read gevent import attempt that used to be on the read path
+
+    python benchmarks/chunk_overhead.py [--chunks 100000] [--profile]
+"""
+import sys
+import timeit
+import logging
+import argparse
+from time import process_time
+from infi.execute import execute, result
+from infi.execute.ioloop import time
+
+# the child writes every chunk separately, and waits a little so the parent reads them one by one
+PRODUCER = """
+import os, time
+for index in range({chunks}):
+    os.write(1, b"%08d\\n" % index)
+    if index % 16 == 0:
+        time.sleep(0)
+"""
+
+
+def failed_import():
+    try:
+        from gevent.os import nb_read  # noqa: F401
+    except ImportError:
+        pass
+
+
+def measure_import():
+    """ returns the seconds per call of the import attempt, and of the global lookup that replaced it """
+    count = 100000
+    import_time = timeit.timeit(failed_import, number=count) / count
+    lookup_time = timeit.timeit("nb_read is None", setup="from infi.execute.utils import nb_read", number=count) / count
+    return import_time, lookup_time
+
+
+def measure_chunks(chunks, log_output):
+    result.LOG_OUTPUT = log_output
+    start_time = time()
+    start_cpu = process_time()
+    output = execute([sys.executable, "-c", PRODUCER.format(chunks=chunks)])
+    cpu = process_time() - start_cpu
+    elapsed = time() - start_time
+    lines = output.get_stats().stdout_bytes // 9
+    return cpu, elapsed, lines
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--profile", action="store_true", help="print the top functions of the parent")
+    args = parser.parse_args()
+    logger = logging.getLogger(result.__name__)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+
+    import_time, lookup_time = measure_import()
+    print("gevent import attempt: {0:.2f}us per read, resolved once: {1:.3f}us".format(import_time * 1e6,
+                                                                                      lookup_time * 1e6))
+    for log_output in (True, False):
+        cpu, elapsed, lines = measure_chunks(args.chunks, log_output)
+        print("output logging {0}: {1:.2f}s cpu / {2:.2f}s wall for {3} lines".format(
+            "on" if log_output else "off", cpu, elapsed, lines))
+    if args.profile:
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        profile.runcall(measure_chunks, args.chunks, False)
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(15)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+""" compares the throughput of capturing a large output with fixed-size reads and with adaptive reads
+
+    python benchmarks/output_throughput.py [--megabytes 1024]
+"""
+import argparse
+from infi.execute import execute, result
+from infi.execute.ioloop import time
+
+
+def run(megabytes):
+    command = "head -c {0} /dev/zero".format(megabytes * 1024 * 1024)
+    start_time = time()
+    output = execute(command, shell=True).get_stdout_capture()
+    elapsed = time() - start_time
+    assert output.get_size() == megabytes * 1024 * 1024
+    return megabytes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=1024)
+    args = parser.parse_args()
+    adaptive = run(args.megabytes)
+    original = (result.MAX_READ_SIZE, result.MAX_READS_PER_EVENT)
+    result.MAX_READ_SIZE, result.MAX_READS_PER_EVENT = result.MIN_READ_SIZE, 1
+    try:
+        fixed = run(args.megabytes)
+    finally:
+        result.MAX_READ_SIZE, result.MAX_READS_PER_EVENT = original
+    print("fixed {0}-byte reads: {1:.1f} MB/s".format(result.MIN_READ_SIZE, fixed))
+    print("adaptive reads: {0:.1f} MB/s ({1:.1f}x)".format(adaptive, adaptive / fixed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+""" compares the spawn rate of the LocalRunner backends as the parent process grows
+
+    python benchmarks/spawn_rate.py [--spawns 500] [--heap-sizes 0,256,1024]
+"""
+import argparse
+from infi.execute import DEVNULL
+from infi.execute.runner import LocalRunner
+from infi.execute.spawn import POPEN, POSIX_SPAWN, FORKSERVER
+from infi.execute.ioloop import time
+
+PAGE_SIZE = 4096
+
+
+def run(runner, spawns):
+    start_time = time()
+    processes = [runner.popen(["true"], stdin=DEVNULL, stdout=DEVNULL, stderr=DEVNULL, close_fds=True)
+                 for _ in range(spawns)]
+    elapsed = time() - start_time
+    for process in processes:
+        process.wait()
+    return spawns / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spawns", type=int, default=500)
+    parser.add_argument("--heap-sizes", default="0,256,1024", help="megabytes, comma separated")
+    args = parser.parse_args()
+    # the fork server is started while the parent is still small
+    runners = [(backend, LocalRunner(backend)) for backend in (POPEN, POSIX_SPAWN, FORKSERVER)]
+    heap = []
+    try:
+        for megabytes in [int(size) for size in args.heap_sizes.split(",")]:
+            heap = bytearray(megabytes * 1024 * 1024)
+            # touch the pages, so they are mapped
+            for index in range(0, len(heap), PAGE_SIZE):
+                heap[index] = 1
+            rates = ", ".join("{0}: {1:.0f}/s".format(backend, run(runner, args.spawns)) for backend, runner in runners)
+            print("{0} MB heap - {1}".format(megabytes, rates))
+    finally:
+        for _, runner in runners:
+            runner.close()
+
+
+if __name__ == "__main__":
+    main()
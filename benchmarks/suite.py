@@ -0,0 +1,140 @@
+""" the benchmark suite of infi.execute, it runs offline and prints the results as JSON so they can be tracked
+
+    python benchmarks/suite.py [--repeat 5] [--quick] [--only latency,fan_out] [--output results.json]
+
+every benchmark runs --repeat times, and reports the median, the minimum and the maximum of its measurement
+"""
+import os
+import sys
+import json
+import signal
+import platform
+import argparse
+from time import gmtime, strftime
+from infi.execute import execute, execute_async, wait_for_many_results, CommandTimeout
+from infi.execute.ioloop import time
+
+MEGABYTE = 1024 * 1024
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def latency(quick):
+    """ seconds per execute(["true"]) """
+    count = 20 if quick else 200
+    start_time = time()
+    for _ in range(count):
+        execute(["true"])
+    return (time() - start_time) / count, "seconds"
+
+
+def fan_out(quick):
+    """ seconds to start N processes and wait for all of them with wait_for_many_results """
+    count = 50 if quick else 500
+    start_time = time()
+    results = [execute_async(["true"]) for _ in range(count)]
+    wait_for_many_results(results)
+    return time() - start_time, "seconds for {0} processes".format(count)
+
+
+def _throughput(quick, stream):
+    megabytes = 64 if quick else 1024
+    command = "head -c {0} /dev/zero >&{1}".format(megabytes * MEGABYTE, 1 if stream == "stdout" else 2)
+    start_time = time()
+    result = execute(command, shell=True)
+    elapsed = time() - start_time
+    capture = result.get_stdout_capture() if stream == "stdout" else result.get_stderr_capture()
+    assert capture.get_size() == megabytes * MEGABYTE
+    return megabytes / elapsed, "MB/s"
+
+
+def stdout_throughput(quick):
+    """ MB/s of captured stdout """
+    return _throughput(quick, "stdout")
+
+
+def stderr_throughput(quick):
+    """ MB/s of captured stderr """
+    return _throughput(quick, "stderr")
+
+
+def stdin_throughput(quick):
+    """ MB/s of stdin fed from memory to a process that discards it """
+    megabytes = 64 if quick else 512
+    data = bytearray(megabytes * MEGABYTE)
+    start_time = time()
+    result = execute(["sh", "-c", "cat > /dev/null"], stdin=data)
+    elapsed = time() - start_time
+    assert result.get_stats().stdin_bytes == len(data)
+    return megabytes / elapsed, "MB/s"
+
+
+def timeout_overshoot(quick):
+    """ seconds between the deadline and the CommandTimeout """
+    timeout = 0.2
+    result = execute_async(["sleep", "100"], timeout=timeout)
+    start_time = time()
+    try:
+        result.wait()
+    except CommandTimeout:
+        pass
+    overshoot = time() - start_time - timeout
+    result.kill(signal.SIGKILL)
+    return overshoot, "seconds"
+
+
+def kill_latency(quick):
+    """ seconds from kill() until the result is finished """
+    result = execute_async(["sleep", "100"])
+    start_time = time()
+    result.kill(signal.SIGKILL)
+    result.wait()
+    return time() - start_time, "seconds"
+
+
+BENCHMARKS = [latency, fan_out, stdout_throughput, stderr_throughput, stdin_throughput, timeout_overshoot,
+              kill_latency]
+
+
+def run(benchmark, repeat, quick):
+    values = []
+    for _ in range(repeat):
+        value, unit = benchmark(quick)
+        values.append(value)
+    return dict(name=benchmark.__name__, description=benchmark.__doc__.strip(), unit=unit,
+                median=_median(values), min=min(values), max=max(values), values=values)
+
+
+def get_environment():
+    return dict(python=sys.version.split()[0], implementation=platform.python_implementation(),
+                platform=platform.platform(), cpus=os.cpu_count(),
+                timestamp=strftime("%Y-%m-%dT%H:%M:%SZ", gmtime()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="smaller workloads, for a sanity check")
+    parser.add_argument("--only", help="comma separated benchmark names")
+    parser.add_argument("--output", help="write the JSON to this file instead of stdout")
+    args = parser.parse_args()
+    benchmarks = BENCHMARKS
+    if args.only:
+        names = args.only.split(",")
+        benchmarks = [benchmark for benchmark in BENCHMARKS if benchmark.__name__ in names]
+    report = dict(environment=get_environment(), quick=args.quick,
+                  benchmarks=[run(benchmark, args.repeat, args.quick) for benchmark in benchmarks])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 # flake8: noqa
 from .__version__ import __version__
-from .runner import local, through_ssh
+from .runner import local, through_ssh, PIPE, STDOUT, DEVNULL
 execute = local.execute
 execute_async = local.execute_async
 execute_assert_success = local.execute_assert_success
+pipeline = local.pipeline
+pipeline_async = local.pipeline_async
+pipeline_assert_success = local.pipeline_assert_success
+execute_many = local.execute_many
 
+from .result import KillPolicy
 from .waiting import wait_for_many_results
+from .pool import ExecutionPool
+from .caching import CachingRunner
+from .fleet import Fleet
+from .hedge import HedgedExecutor, execute_hedged
 from .utils import make_fd_non_blocking
 from .exceptions import *
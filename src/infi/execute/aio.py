@@ -0,0 +1,185 @@
+""" asyncio front end: the pipes of the results are handled by the running event loop, no helper threads
+
+    >>> result = await local.aexecute(["echo", "hello"])
+    >>> result = await local.execute_async(["sleep", "1"])   # results are awaitable
+"""
+import asyncio
+import weakref
+from .ioloop import IOLoop, time, _get_fileno
+from .exceptions import CommandTimeout
+from .waiting import DEFAULT_SAMPLE_INTERVAL
+
+
+class AsyncioIOLoop(IOLoop):
+    """ an IOLoop that dispatches the handlers from an asyncio event loop (through add_reader/add_writer).
+    it is driven by the event loop, so do_iteration can't be used """
+    def __init__(self, loop):
+        # we don't call IOLoop.__init__ because we don't need a poller, the event loop does the polling
+        self._loop = loop
+        self._watched = {}
+        self._sweep_handle = None
+        self.reset()
+
+    def close(self):
+        for f in list(self._reads.keys()):
+            self.unregister_read(f)
+        for f in list(self._writes.keys()):
+            self.unregister_write(f)
+
+    def _register(self, collection, fd, handler):
+        if fd in collection:
+            raise NotImplementedError("Multiple registrations on single file")
+        collection[fd] = handler
+        fileno = self._filenos[fd] = _get_fileno(fd)
+        if collection is self._reads:
+            self._loop.add_reader(fileno, self._dispatch_readable, fd)
+        else:
+            self._loop.add_writer(fileno, self._dispatch_writeable, fd)
+
+    def _unregister(self, collection, fd):
+        if fd not in collection:
+            raise NotImplementedError("Unregistering non-registered file")
+        collection.pop(fd)
+        fileno = self._filenos[fd]
+        if collection is self._reads:
+            self._loop.remove_reader(fileno)
+        else:
+            self._loop.remove_writer(fileno)
+        if fd not in self._reads and fd not in self._writes:
+            self._filenos.pop(fd)
+
+    def call_at(self, when, callback):
+        """ the timer is an asyncio.TimerHandle, which can be cancelled as well """
+        return self._loop.call_later(max(0, when - time()), self._dispatch_timer, callback)
+
+    def do_iteration(self, timeout=None):
+        raise NotImplementedError("AsyncioIOLoop is driven by the asyncio event loop")
+
+    def _dispatch_readable(self, f):
+        self._handle_readable(f)
+        self._schedule_sweep()
+
+    def _dispatch_writeable(self, f):
+        self._handle_writeable(f)
+        self._schedule_sweep()
+
+    def _dispatch_timer(self, callback):
+        # timers end the drain of the output, like the handlers they may finish results
+        callback()
+        self._schedule_sweep()
+
+    def watch(self, result):
+        """ returns a future that is done when the result is finished """
+        future = self._watched.get(result)
+        if future is None:
+            future = self._watched[result] = self._loop.create_future()
+            result.register_to_ioloop(self)
+            self._schedule_sweep()
+        return future
+
+    def unwatch(self, result):
+        self._watched.pop(result, None)
+
+    def _schedule_sweep(self):
+        if self._sweep_handle is None and self._watched:
+            self._sweep_handle = self._loop.call_soon(self._sweep)
+
+    def _sweep(self):
+        self._sweep_handle = None
+        for result, future in list(self._watched.items()):
+            if not result.is_exit_signaled():
+                # we'll be woken up by the pidfd when the process exits
+                continue
+            try:
+                finished = result.is_finished()
+            except Exception as error:
+                finished, exception = True, error
+            else:
+                exception = None
+            if not finished:
+                continue
+            self._watched.pop(result)
+            if future.done():
+                continue
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
+        if any(not result.has_exit_notification() for result in self._watched):
+            # these processes don't wake us up when they exit, so we sample them
+            self._sweep_handle = self._loop.call_later(DEFAULT_SAMPLE_INTERVAL, self._sweep)
+
+
+_ioloops = weakref.WeakKeyDictionary()
+
+
+def get_ioloop(loop=None):
+    """ returns the AsyncioIOLoop of the running (or given) event loop """
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    ioloop = _ioloops.get(loop)
+    if ioloop is None:
+        ioloop = _ioloops[loop] = AsyncioIOLoop(loop)
+    return ioloop
+
+
+async def wait(result, timeout=None):
+    """ waits for the result, with the same semantics as Result.wait:
+    raises CommandTimeout when the timeout (or the result's deadline) passes, and ExecutionError on failure
+    when the result was executed with assert_success """
+    ioloop = get_ioloop()
+    future = ioloop.watch(result)
+    if not future.done() and result.is_finished():
+        # the process finished before we waited, even if the deadline passed since
+        ioloop.unwatch(result)
+    else:
+        deadline = result.get_deadline()
+        if timeout is not None:
+            deadline = time() + timeout if deadline is None else min(deadline, time() + timeout)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), None if deadline is None else max(0, deadline - time()))
+        except asyncio.TimeoutError:
+            ioloop.unwatch(result)
+            result._report_timeout()
+            raise CommandTimeout(result)
+    if result.has_timed_out():
+        # the deadline passed during the wait, and the kill policy ended the process
+        raise CommandTimeout(result)
+    return True
+
+
+async def wait_for_many_results(results, timeout=None):
+    """ returns the list of results that finished before the timeout """
+    results = list(results)
+    if not results:
+        return []
+    ioloop = get_ioloop()
+    futures = [ioloop.watch(result) for result in results]
+    await asyncio.wait(futures, timeout=timeout)
+    finished = []
+    for result, future in zip(results, futures):
+        if not future.done():
+            ioloop.unwatch(result)
+        elif future.exception() is None:
+            finished.append(result)
+        else:
+            raise future.exception()
+    return finished
+
+
+async def completed(result):
+    """ waits for the result and returns it, this is what awaiting a Result does """
+    await wait(result)
+    return result
+
+
+async def completed_pipeline(pipeline):
+    """ waits for all of the stages of the pipeline and returns it, this is what awaiting a PipelineResult does """
+    for result in pipeline.get_results():
+        await wait(result)
+    pipeline.poll()
+    return pipeline
+
+
+async def execute(runner, *args, **kwargs):
+    return await completed(runner.execute_async(*args, **kwargs))
@@ -0,0 +1,129 @@
+""" running many commands in one session of a runner (see Runner.execute_batch)
+
+the commands are sent as a shell script to the stdin of a single "sh -s", which runs them one after the other
+and writes their output in frames: a header line, "#infi-batch# <index> <out|err> <length>", followed by
+<length> bytes of output, and "#infi-batch# <index> exit <status>" when the command is done.
+through an SSHRunner this costs one ssh session (and round trip) for the whole batch
+"""
+from .result import Result
+from .exceptions import ExecutionError
+from .output import CaptureAll
+try:
+    from shlex import quote as shell_quote
+except ImportError:
+    from pipes import quote as shell_quote
+
+MARKER = b"#infi-batch#"
+
+_SCRIPT_HEADER = r"""
+dir=$(mktemp -d) || exit 125
+trap 'rm -rf "$dir"' EXIT
+run() {
+    (eval "$2") < /dev/null > "$dir/out" 2> "$dir/err"
+    status=$?
+    for stream in out err; do
+        printf '%s %s %s %s\n' "$marker" "$1" "$stream" $(($(wc -c < "$dir/$stream")))
+        cat "$dir/$stream"
+    done
+    printf '%s %s exit %s\n' "$marker" "$1" "$status"
+}
+"""
+
+
+def get_command_line(command):
+    """ commands are shell command lines, and lists of arguments are quoted """
+    if isinstance(command, str):
+        return command
+    return " ".join(shell_quote(arg) for arg in command)
+
+
+def build_script(commands):
+    lines = ["marker='{0}'".format(MARKER.decode("ascii")), _SCRIPT_HEADER]
+    for index, command in enumerate(commands):
+        lines.append("run {0} {1}".format(index, shell_quote(get_command_line(command))))
+    return "\n".join(lines).encode("utf-8") + b"\n"
+
+
+class FrameParser(object):
+    """ splits the output of the batch script (fed in chunks of any size) into the output and exit status of
+    the commands. lines that are not frame headers (like the noise of a login shell) are skipped """
+    def __init__(self, count):
+        super(FrameParser, self).__init__()
+        self.outputs = [dict(out=bytearray(), err=bytearray()) for _ in range(count)]
+        self.returncodes = [None] * count
+        self._buffer = bytearray()
+        self._target = None
+        self._remaining = 0
+
+    def __call__(self, chunk):
+        buffer = self._buffer
+        buffer += chunk
+        while buffer:
+            if self._remaining:
+                count = min(self._remaining, len(buffer))
+                self._target += buffer[:count]
+                del buffer[:count]
+                self._remaining -= count
+                continue
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                return
+            header = bytes(buffer[:newline]).split(b" ")
+            del buffer[:newline + 1]
+            self._parse_header(header)
+
+    def _parse_header(self, header):
+        if len(header) != 4 or header[0] != MARKER:
+            return
+        index, kind, value = int(header[1]), header[2].decode("ascii"), int(header[3])
+        if kind == "exit":
+            self.returncodes[index] = value
+        else:
+            self._target = self.outputs[index][kind]
+            self._remaining = value
+
+
+class BatchedProcess(object):
+    """ the Popen stand-in of a command that ran in a batch, it has already exited. pid is the pid of the
+    process that ran the batch """
+    def __init__(self, args, pid, returncode):
+        super(BatchedProcess, self).__init__()
+        self.args = args
+        self.pid = pid
+        self.returncode = returncode
+        self.stdin = self.stdout = self.stderr = None
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+def execute_batch(runner, commands, assert_success=False, timeout=None, capture=None, **kwargs):
+    """ runs the commands in a single "sh -s" of the runner, returns a Result for every command.
+    the batch fails as a whole (with ExecutionError of the session) if it exits before reporting all of the
+    commands, and it times out as a whole. with assert_success, ExecutionError is raised for the first command
+    that failed. the rest of the arguments are passed to the execute of the session """
+    commands = list(commands)
+    parser = FrameParser(len(commands))
+    session = runner.execute("sh -s", shell=True, stdin=build_script(commands), timeout=timeout,
+                             stdout_callback=parser, capture_output=False, **kwargs)
+    if None in parser.returncodes:
+        raise ExecutionError(session)
+    capture = CaptureAll() if capture is None else capture
+    results = []
+    for command, output, returncode in zip(commands, parser.outputs, parser.returncodes):
+        result = Result(command, BatchedProcess(command, session.get_pid(), returncode), stdin=None,
+                        assert_success=False, timeout=None, capture=capture)
+        for buffer, data in ((result.get_stdout_capture(), output["out"]),
+                             (result.get_stderr_capture(), output["err"])):
+            buffer.write(bytes(data))
+            buffer.finish()
+        result.poll()
+        results.append(result)
+    if assert_success:
+        for result in results:
+            if result.get_returncode() != 0:
+                raise ExecutionError(result)
+    return results
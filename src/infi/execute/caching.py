@@ -0,0 +1,183 @@
+""" a runner wrapper that caches the results of idempotent (read-only) commands
+
+    >>> runner = CachingRunner(local, ttl=5)
+    >>> result = runner.execute(["lsscsi"], cacheable=True)   # runs lsscsi
+    >>> result = runner.execute(["lsscsi"], cacheable=True)   # the same result, for the next 5 seconds
+
+the results are keyed on the command, shell, env, cwd, stdin and the host of the wrapped runner. identical
+requests that arrive while the command runs wait for it rather than running it again (single-flight), and all
+of them get the same Result. commands that are not marked cacheable, or that use arguments that can't be shared
+between callers (like output callbacks), are executed as usual
+"""
+import threading
+from collections import OrderedDict
+from .runner import Runner
+from .ioloop import time
+from .exceptions import ExecutionError, CommandTimeout
+try:
+    from gevent.event import Event
+except ImportError:
+    from threading import Event
+
+DEFAULT_TTL = 10
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# arguments that are part of the key, other arguments (except for these below) make the command uncacheable
+_KEY_ARGUMENTS = ("shell", "env", "cwd", "stdin")
+# arguments that don't change the output, they apply to the caller that runs the command
+_IGNORED_ARGUMENTS = ("assert_success", "timeout", "close_fds", "kill_policy", "new_session")
+
+
+class _Flight(object):
+    """ a command that runs on behalf of all of the callers that asked for it """
+    def __init__(self):
+        super(_Flight, self).__init__()
+        self.started = Event()
+        self.done = Event()
+        # the result of the leader, while its command runs
+        self.running = None
+        self.result = None
+        self.error = None
+
+
+class CachingRunner(Runner):
+    def __init__(self, runner, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        """ caches the results of runner for ttl seconds, the least recently used results are evicted when there
+        are more than max_entries of them, or when their output takes more than max_bytes """
+        super(CachingRunner, self).__init__()
+        self._runner = runner
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (expiry time, size, result), from the least recently used
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def host(self):
+        return getattr(self._runner, "host", None)
+
+    def popen(self, *args, **kwargs):
+        return self._runner.popen(*args, **kwargs)
+
+    def execute_async(self, *args, **kwargs):
+        """ not cached, the result is started and returned right away """
+        kwargs.pop("cacheable", None)
+        return self._runner.execute_async(*args, **kwargs)
+
+    def execute(self, command, cacheable=False, **kwargs):
+        """ with cacheable=True, returns the cached result if there's a fresh one. otherwise, the command is
+        executed, and identical requests made meanwhile wait for it and get its result.
+        assert_success and timeout are applied to every caller: a caller whose timeout passes gets CommandTimeout,
+        and the command keeps running for the others. failed results are cached too. if the command times out
+        (or fails to start) the error is raised in every caller and nothing is cached """
+        key = self._get_key(command, kwargs) if cacheable else None
+        if key is None:
+            return self._runner.execute(command, **kwargs)
+        assert_success = kwargs.pop("assert_success", False)
+        result = self._get_result(key, command, kwargs)
+        if assert_success and result.get_returncode() != 0:
+            raise ExecutionError(result)
+        return result
+
+    def _get_key(self, command, kwargs):
+        """ returns None if the command can't be cached """
+        if any(name not in _KEY_ARGUMENTS and name not in _IGNORED_ARGUMENTS for name in kwargs):
+            return None
+        stdin = kwargs.get("stdin")
+        if stdin is not None and not isinstance(stdin, bytes):
+            # file objects and iterables are consumed by the command
+            return None
+        env = kwargs.get("env")
+        return (self.host, command if isinstance(command, str) else tuple(command), bool(kwargs.get("shell")),
+                None if env is None else frozenset(env.items()), kwargs.get("cwd"), stdin)
+
+    def _get_result(self, key, command, kwargs):
+        timeout = kwargs.get("timeout")
+        deadline = None if timeout is None else time() + timeout
+        with self._lock:
+            result = self._lookup(key)
+            if result is not None:
+                self.hits += 1
+                return result
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+        if leader:
+            self._run(flight, key, command, kwargs)
+        else:
+            self._wait(flight, deadline)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _wait(self, flight, deadline):
+        # the leader starts the command right away, and we need its result for CommandTimeout
+        flight.started.wait()
+        if deadline is None:
+            flight.done.wait()
+        elif not flight.done.wait(max(0, deadline - time())):
+            raise CommandTimeout(flight.running)
+
+    def _run(self, flight, key, command, kwargs):
+        try:
+            try:
+                flight.running = self._runner.execute_async(command, **kwargs)
+            finally:
+                flight.started.set()
+            flight.running.wait()
+            flight.result = flight.running
+        except Exception as error:
+            flight.error = error
+        with self._lock:
+            self._flights.pop(key)
+            if flight.error is None:
+                self._store(key, flight.result)
+        flight.done.set()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expiry, size, result = entry
+        if expiry <= time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _store(self, key, result):
+        size = result.get_stdout_capture().get_size() + result.get_stderr_capture().get_size()
+        if size > self._max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time() + self._ttl, size, result)
+        self._size += size
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def invalidate(self, command=None, **kwargs):
+        """ drops the cached result of the command (with the same key arguments), or all of them when command
+        is None. commands that are running are not affected """
+        with self._lock:
+            if command is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            key = self._get_key(command, kwargs)
+            if key in self._entries:
+                self._remove(key)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,148 @@
+""" notifications on child exit, so waiters can sleep in the IOLoop instead of polling the children
+
+a pidfd (Linux 5.3+) becomes readable when its process terminates, and is registered per child.
+where pidfds are not available, a SIGCHLD handler writes to a pipe per subscribed waiter (self-pipe trick).
+the handler is installed only while there are waiters
+"""
+import os
+import sys
+import signal
+import errno
+import threading
+from .utils import make_fd_non_blocking, nb_read
+
+
+# the number of pidfd_open in the syscall table that all of the architectures share since Linux 5.1
+# (except for alpha, ia64 and mips, which have their own numbering)
+_PIDFD_OPEN_SYSCALL = 434
+
+
+def _get_pidfd_open():
+    """ os.pidfd_open is new in python 3.9, before that we make the system call through ctypes """
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is not None or not sys.platform.startswith("linux"):
+        return pidfd_open
+    import platform
+    if platform.machine().startswith(("alpha", "ia64", "mips")):
+        return None
+    try:
+        import ctypes
+        syscall = ctypes.CDLL(None, use_errno=True).syscall
+    except (ImportError, OSError, AttributeError):
+        return None
+
+    def pidfd_open(pid, flags=0):
+        fd = syscall(_PIDFD_OPEN_SYSCALL, ctypes.c_int(pid), ctypes.c_uint(flags))
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        return fd
+    return pidfd_open
+
+
+_pidfd_open = _get_pidfd_open()
+
+
+def open_pidfd(pid):
+    """ returns a file descriptor that becomes readable when the process exits, or None if not supported """
+    if _pidfd_open is None:
+        return None
+    try:
+        return _pidfd_open(pid)
+    except (OSError, ValueError):
+        # ENOSYS on older kernels, EPERM in some sandboxes
+        return None
+
+
+def drain_fd(fd):
+    while True:
+        try:
+            if not os.read(fd, 512):
+                return
+        except OSError as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+
+
+def _is_gevent_used():
+    return nb_read is not None
+
+
+def _is_main_thread():
+    main_thread = getattr(threading, "main_thread", None)
+    if main_thread is not None:
+        return threading.current_thread() is main_thread()
+    return isinstance(threading.current_thread(), threading._MainThread)
+
+
+class SigchldWakeup(object):
+    def __init__(self):
+        super(SigchldWakeup, self).__init__()
+        self._pipes = {}
+        self._free_pipes = []
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def subscribe(self):
+        """ returns the read end of a pipe that becomes readable whenever a child exits,
+        or None when we can't install a SIGCHLD handler """
+        with self._lock:
+            if not self._install():
+                return None
+            if self._free_pipes:
+                read_fd, write_fd = self._free_pipes.pop()
+            else:
+                read_fd, write_fd = os.pipe()
+                make_fd_non_blocking(read_fd)
+                make_fd_non_blocking(write_fd)
+            self._pipes[read_fd] = write_fd
+            return read_fd
+
+    def unsubscribe(self, read_fd):
+        # the pipes are never closed, because the signal handler may be writing to them at any moment
+        # (and a closed descriptor may be reused by someone else) - they are kept for the next subscriber
+        with self._lock:
+            write_fd = self._pipes.pop(read_fd)
+            drain_fd(read_fd)
+            self._free_pipes.append((read_fd, write_fd))
+            if not self._pipes:
+                self._uninstall()
+
+    def _install(self):
+        if self._installed:
+            if signal.getsignal(signal.SIGCHLD) == self._handle_signal:
+                return True
+            # someone replaced our handler, so the pipes are not written anymore
+            self._installed = False
+        if os.name == 'nt' or not hasattr(signal, "SIGCHLD") or _is_gevent_used():
+            return False
+        if not _is_main_thread():
+            # signal handlers can only be installed from the main thread
+            return False
+        if signal.getsignal(signal.SIGCHLD) not in (signal.SIG_DFL, None):
+            # someone else is handling SIGCHLD, we don't want to interfere
+            return False
+        signal.signal(signal.SIGCHLD, self._handle_signal)
+        self._installed = True
+        return True
+
+    def _uninstall(self):
+        """ the disposition of SIGCHLD is global, so we restore it when nobody waits """
+        if not self._installed or not _is_main_thread():
+            # from other threads we can't, the handler is removed by the next unsubscribe of the main thread
+            return
+        if signal.getsignal(signal.SIGCHLD) == self._handle_signal:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        self._installed = False
+
+    def _handle_signal(self, signum, frame):
+        for write_fd in list(self._pipes.values()):
+            try:
+                os.write(write_fd, b'\0')
+            except OSError:
+                # the pipe is full (a wakeup is already pending) or was just closed
+                pass
+
+
+sigchld_wakeup = SigchldWakeup()
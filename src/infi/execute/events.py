@@ -0,0 +1,138 @@
+""" instrumentation of the execution of commands
+
+listeners (subclasses of Listener, registered with add_listener) are notified when a process is spawned, when
+its first byte of output arrives, on every chunk of output, and when it exits, times out or is killed.
+the call sites check the listeners list before building an event, so without listeners there's no overhead
+beyond that check. MetricsCollector is a listener that keeps histograms of the latencies and throughput
+"""
+import math
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+listeners = []
+_lock = threading.Lock()
+
+
+class Listener(object):
+    """ the base class of listeners, the methods are called from the thread that runs the ioloop """
+    def spawned(self, result):
+        pass
+
+    def first_byte(self, result, stream):
+        """ stream is "stdout" or "stderr" """
+        pass
+
+    def chunk(self, result, stream, size):
+        pass
+
+    def exited(self, result):
+        """ called once the process was reaped and its output was read """
+        pass
+
+    def timed_out(self, result):
+        pass
+
+    def killed(self, result, signal):
+        pass
+
+
+def add_listener(listener):
+    global listeners
+    with _lock:
+        # the list is replaced rather than changed, so the events being emitted are not affected
+        listeners = listeners + [listener]
+
+
+def remove_listener(listener):
+    global listeners
+    with _lock:
+        listeners = [item for item in listeners if item is not listener]
+
+
+def emit(event, *args):
+    for listener in listeners:
+        try:
+            getattr(listener, event)(*args)
+        except Exception:
+            logger.exception("listener %r failed on %s", listener, event)
+
+
+class Histogram(object):
+    """ a histogram with power-of-two buckets, for values that span several orders of magnitude """
+    def __init__(self):
+        super(Histogram, self).__init__()
+        self._buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = None
+
+    def add(self, value):
+        bucket = int(math.floor(math.log(value, 2))) if value > 0 else None
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def get_mean(self):
+        return self.total / self.count if self.count else None
+
+    def get_percentile(self, percentile):
+        """ returns the upper bound of the bucket of the percentile (0-100) """
+        if not self.count:
+            return None
+        rank = percentile / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self._buckets, key=lambda bucket: float("-inf") if bucket is None else bucket):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return 0 if bucket is None else min(2 ** (bucket + 1), self.max)
+        return self.max
+
+    def __repr__(self):
+        return "<Histogram: count={0}, mean={1}, p50={2}, p99={3}, max={4}>".format(
+            self.count, self.get_mean(), self.get_percentile(50), self.get_percentile(99), self.max)
+
+
+class MetricsCollector(Listener):
+    """ collects counters and histograms of spawn time, time to first byte, wall time, chunk sizes and
+    output throughput (bytes per second of wall time) """
+    def __init__(self):
+        super(MetricsCollector, self).__init__()
+        self.spawned_count = 0
+        self.exited_count = 0
+        self.failed_count = 0
+        self.timed_out_count = 0
+        self.killed_count = 0
+        self.spawn_time = Histogram()
+        self.first_byte_time = Histogram()
+        self.wall_time = Histogram()
+        self.chunk_size = Histogram()
+        self.throughput = Histogram()
+
+    def spawned(self, result):
+        self.spawned_count += 1
+        spawn_time = result.get_stats().spawn_time
+        if spawn_time is not None:
+            self.spawn_time.add(spawn_time)
+
+    def first_byte(self, result, stream):
+        self.first_byte_time.add(result.get_elapsed_time())
+
+    def chunk(self, result, stream, size):
+        self.chunk_size.add(size)
+
+    def exited(self, result):
+        self.exited_count += 1
+        if result.get_returncode() != 0:
+            self.failed_count += 1
+        stats = result.get_stats()
+        if stats.wall_time:
+            self.wall_time.add(stats.wall_time)
+            self.throughput.add((stats.stdout_bytes + stats.stderr_bytes) / stats.wall_time)
+
+    def timed_out(self, result):
+        self.timed_out_count += 1
+
+    def killed(self, result, signal):
+        self.killed_count += 1
@@ -1,9 +1,20 @@
+MAX_OUTPUT_IN_MESSAGE = 4096
+
+
+def _format_output(capture):
+    """ renders the head and the tail of the output, so huge outputs don't end up in the message """
+    head, omitted, tail = capture.get_preview(MAX_OUTPUT_IN_MESSAGE // 2, MAX_OUTPUT_IN_MESSAGE // 2)
+    if not omitted:
+        return repr(head + tail)
+    return "%r...<%s bytes omitted>...%r" % (head, omitted, tail)
+
+
 class ExecutionError(Exception):
     def __init__(self, result):
-        super(ExecutionError, self).__init__("Execution of %r failed!\nresult=%s\nstdout=%r\nstderr=%r" % (result._command,
+        super(ExecutionError, self).__init__("Execution of %r failed!\nresult=%s\nstdout=%s\nstderr=%s" % (result._command,
                                                                                                            result.get_returncode(),
-                                                                                                           result.get_stdout(),
-                                                                                                           result.get_stderr()))
+                                                                                                           _format_output(result.get_stdout_capture()),
+                                                                                                           _format_output(result.get_stderr_capture())))
         self.result = result
 
 
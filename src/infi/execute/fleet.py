@@ -0,0 +1,76 @@
+""" running a command on many hosts through ssh
+
+    >>> fleet = Fleet(["host1", "host2"], max_parallel=100, connect_timeout=5)
+    >>> for host_result in fleet.execute(["uname", "-r"], timeout=30):
+    ...     print(host_result.host, host_result.status, host_result.result.get_stdout())
+
+the hosts are scheduled on an ExecutionPool, with a global limit and a limit per host, and the results are
+yielded as the hosts finish. every host has its own timeout (and ssh's ConnectTimeout for unreachable hosts),
+so a straggler is killed and reported without holding back the others
+"""
+from collections import namedtuple
+from .pool import ExecutionPool, DEFAULT_MAX_PARALLEL
+from .runner import SSHRunner
+
+OK = "ok"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+UNREACHABLE = "unreachable"
+# ssh exits with 255 when it can't connect (or when the remote command does, we can't tell these apart)
+SSH_ERROR_RETURNCODE = 255
+
+HostResult = namedtuple("HostResult", ["host", "status", "result"])
+
+
+def get_status(result):
+    """ returns OK, FAILED, TIMED_OUT or UNREACHABLE """
+    if result.has_timed_out():
+        return TIMED_OUT
+    returncode = result.get_returncode()
+    if returncode == SSH_ERROR_RETURNCODE:
+        return UNREACHABLE
+    return OK if returncode == 0 else FAILED
+
+
+class Fleet(object):
+    def __init__(self, hosts, max_parallel=DEFAULT_MAX_PARALLEL, max_per_host=1, connect_timeout=10,
+                 runner_factory=None, **runner_kwargs):
+        """ hosts are host names (or SSHRunner objects). runners are created with
+        runner_factory(host, connect_timeout=connect_timeout, **runner_kwargs), which is SSHRunner by default.
+        at most max_parallel commands run at once, and at most max_per_host on every host """
+        super(Fleet, self).__init__()
+        runner_factory = SSHRunner if runner_factory is None else runner_factory
+        self._runners = [host if isinstance(host, SSHRunner) else
+                         runner_factory(host, connect_timeout=connect_timeout, **runner_kwargs) for host in hosts]
+        self._max_parallel = max_parallel
+        self._max_per_host = max_per_host
+
+    def get_hosts(self):
+        return [runner.host for runner in self._runners]
+
+    def execute(self, command, timeout=None, **kwargs):
+        """ runs the command on every host, and yields a HostResult for every host as it finishes.
+        command can be a function of the host that returns its command. timeout applies to every host
+        separately, from the moment its command is started. the rest of the arguments are passed to
+        execute_async """
+        pool = ExecutionPool(self._max_parallel, self._max_per_host)
+        jobs = ((runner, (command(runner.host) if callable(command) else command,), dict(kwargs, timeout=timeout))
+                for runner in self._runners)
+        for (runner, _, _), result in pool.as_completed_jobs(jobs):
+            yield HostResult(runner.host, get_status(result), result)
+
+    def execute_all(self, command, timeout=None, **kwargs):
+        """ runs the command on every host, returns a dict of host to HostResult """
+        return dict((host_result.host, host_result)
+                    for host_result in self.execute(command, timeout=timeout, **kwargs))
+
+    def close(self):
+        """ stops the master connections of multiplexed runners """
+        for runner in self._runners:
+            runner.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,99 @@
+""" hedged execution: running a command on several equivalent targets (hosts, paths, controllers) to cut the
+tail latency
+
+the command is started on the first runner, and if it hasn't finished after the hedging delay, it's started
+on the next runner as well (and so on). the first successful result is returned, and the commands that are
+still running are killed. the delay is fixed, or a percentile of the latencies of the recent executions
+"""
+from collections import deque
+from .ioloop import time
+from .waiting import wait_for_many_results, FIRST_COMPLETED
+from .exceptions import ExecutionError, CommandTimeout
+
+DEFAULT_PERCENTILE = 95
+DEFAULT_HISTORY = 100
+DEFAULT_INITIAL_DELAY = 1.0
+# the percentile of fewer latencies than this isn't meaningful, so the initial delay is used
+MIN_SAMPLES = 10
+
+
+class HedgedExecutor(object):
+    def __init__(self, runners, delay=None, percentile=DEFAULT_PERCENTILE, history=DEFAULT_HISTORY,
+                 initial_delay=DEFAULT_INITIAL_DELAY):
+        """ runners are the equivalent targets, in the order of preference. the next runner is started delay
+        seconds after the previous one, or without a delay, after the given percentile of the latencies of the
+        last history successful executions (initial_delay until there are enough of them) """
+        super(HedgedExecutor, self).__init__()
+        self._runners = list(runners)
+        self._delay = delay
+        self._percentile = percentile
+        self._initial_delay = initial_delay
+        self._latencies = deque(maxlen=history)
+        self.hedged_count = 0
+
+    def get_delay(self):
+        if self._delay is not None:
+            return self._delay
+        if len(self._latencies) < MIN_SAMPLES:
+            return self._initial_delay
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self._percentile / 100.0))
+        return latencies[index]
+
+    def execute(self, command, timeout=None, assert_success=False, **kwargs):
+        """ returns the first successful result, or the last failed one if the command failed on all of the
+        runners. command can be a function of the runner that returns its command. timeout applies to the
+        whole execution, when it passes the commands are killed and CommandTimeout is raised.
+        the rest of the arguments are passed to execute_async """
+        start_time = time()
+        deadline = None if timeout is None else start_time + timeout
+        runners = deque(self._runners)
+        running = []
+        failed = None
+        next_start = start_time
+        while True:
+            if runners and (not running or time() >= next_start):
+                if running:
+                    self.hedged_count += 1
+                running.append(self._start(runners.popleft(), command, deadline, kwargs))
+                next_start = time() + self.get_delay()
+            if not running:
+                break
+            wait_timeout = self._get_wait_timeout(runners, next_start, deadline)
+            finished = wait_for_many_results(running, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+            finished = [result for result in finished if result is not None]
+            for result in finished:
+                running.remove(result)
+                if result.get_returncode() == 0:
+                    self._kill(running)
+                    self._latencies.append(time() - start_time)
+                    return result
+                failed = result
+                # the next runner takes the place of the failed one right away
+                next_start = time()
+            if deadline is not None and deadline <= time() and running:
+                self._kill(running)
+                raise CommandTimeout(running[0])
+        if assert_success:
+            raise ExecutionError(failed)
+        return failed
+
+    def _start(self, runner, command, deadline, kwargs):
+        command = command(runner) if callable(command) else command
+        timeout = None if deadline is None else max(0, deadline - time())
+        return runner.execute_async(command, timeout=timeout, **kwargs)
+
+    def _get_wait_timeout(self, runners, next_start, deadline):
+        timeouts = [max(0, when - time()) for when in (next_start if runners else None, deadline)
+                    if when is not None]
+        return min(timeouts) if timeouts else None
+
+    def _kill(self, results):
+        """ the losers are killed, their processes are reaped when the ioloop notices they exited """
+        for result in results:
+            result.kill()
+
+
+def execute_hedged(runners, command, delay=DEFAULT_INITIAL_DELAY, **kwargs):
+    """ runs the command with a HedgedExecutor that has a fixed delay, see HedgedExecutor.execute """
+    return HedgedExecutor(runners, delay=delay).execute(command, **kwargs)
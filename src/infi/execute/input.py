@@ -0,0 +1,180 @@
+""" sources for the stdin of the processes
+
+stdin can be bytes, a file (FileInput, a file object or a file descriptor) or an iterable of chunks.
+the sources write to the non-blocking stdin pipe as much as it accepts whenever it's writeable, and keep track
+of partial writes, so large inputs are never held in memory as a whole (except when given as bytes)
+"""
+import os
+import errno
+
+MAX_INPUT_CHUNK_SIZE = 1024
+FILE_CHUNK_SIZE = 1024 * 1024
+
+
+def _write(fd, view):
+    """ returns the number of bytes written, or None if the pipe is full """
+    try:
+        return os.write(fd, view)
+    except (IOError, OSError) as error:
+        if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+            return None
+        raise
+
+
+class BytesInput(object):
+    def __init__(self, data):
+        super(BytesInput, self).__init__()
+        self._view = memoryview(data)
+        self._offset = 0
+        self.size_hint = len(self._view)
+
+    def write_to(self, fd):
+        """ writes as much as the pipe accepts, returns True when the input is exhausted """
+        while self._offset < len(self._view):
+            chunk = self._view[self._offset:]
+            if os.name == 'nt':
+                # the pipes are blocking on Windows
+                chunk = chunk[:MAX_INPUT_CHUNK_SIZE]
+            written = _write(fd, chunk)
+            if written is None:
+                return False
+            self._offset += written
+            if written < len(chunk):
+                # the pipe is full
+                return False
+        return True
+
+    def get_written(self):
+        """ returns the number of bytes written so far """
+        return self._offset
+
+    def close(self):
+        self._view.release()
+
+
+class IterableInput(object):
+    """ writes the chunks of an iterable (a generator, for example) as the pipe accepts them.
+    note that the iterable is consumed in the ioloop, so it shouldn't block """
+    def __init__(self, iterable):
+        super(IterableInput, self).__init__()
+        self._iterator = iter(iterable)
+        self._pending = None
+        self._written = 0
+        self.size_hint = None
+
+    def write_to(self, fd):
+        while True:
+            if self._pending is None:
+                chunk = next(self._iterator, None)
+                if chunk is None:
+                    return True
+                self._pending = BytesInput(chunk)
+            if not self._pending.write_to(fd):
+                return False
+            self._written += self._pending.get_written()
+            self._pending = None
+
+    def get_written(self):
+        return self._written + (self._pending.get_written() if self._pending is not None else 0)
+
+    def close(self):
+        close = getattr(self._iterator, "close", None)
+        if close is not None:
+            close()
+
+
+class FileInput(object):
+    """ feeds stdin from a file path, a file descriptor or a file object (from its descriptor's current position).
+    the data is moved inside the kernel with splice or sendfile where possible, and copied through a buffer
+    otherwise. files opened from a path are closed when they are exhausted """
+    def __init__(self, source):
+        super(FileInput, self).__init__()
+        self._owned = False
+        if isinstance(source, int):
+            self._fd = source
+        elif hasattr(source, "fileno"):
+            self._fd = source.fileno()
+        else:
+            self._fd = os.open(source, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            self._owned = True
+        self._methods = [self._splice, self._sendfile, self._copy]
+        self._pending = None
+        self._written = 0
+        self.size_hint = None
+
+    def _splice(self, fd):
+        return os.splice(self._fd, fd, FILE_CHUNK_SIZE, flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK)
+
+    def _sendfile(self, fd):
+        return os.sendfile(fd, self._fd, None, FILE_CHUNK_SIZE)
+
+    def _copy(self, fd):
+        data = os.read(self._fd, FILE_CHUNK_SIZE)
+        if data:
+            self._pending = BytesInput(data)
+        return len(data)
+
+    def _transfer(self, fd):
+        while True:
+            method = self._methods[0]
+            if method != self._copy and not hasattr(os, method.__name__[1:]):
+                self._methods.pop(0)
+                continue
+            try:
+                transferred = method(fd)
+            except (IOError, OSError) as error:
+                if method == self._copy or error.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP,
+                                                                 errno.EOPNOTSUPP, errno.ESPIPE):
+                    raise
+                # this kind of file (or kernel) doesn't support the method, fall back to the next one
+                self._methods.pop(0)
+                continue
+            if method != self._copy:
+                # the copied data is counted once it's written
+                self._written += transferred
+            return transferred
+
+    def write_to(self, fd):
+        while True:
+            if self._pending is not None:
+                if not self._pending.write_to(fd):
+                    return False
+                self._written += self._pending.get_written()
+                self._pending = None
+            try:
+                transferred = self._transfer(fd)
+            except (IOError, OSError) as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return False
+                raise
+            if not transferred:
+                self.close()
+                return True
+
+    def get_written(self):
+        return self._written + (self._pending.get_written() if self._pending is not None else 0)
+
+    def close(self):
+        if self._owned:
+            self._owned = False
+            os.close(self._fd)
+
+
+def create_input(stdin):
+    """ returns the input source for the stdin argument of execute """
+    if stdin is None:
+        return BytesInput(b'')
+    if isinstance(stdin, (bytes, bytearray, memoryview)):
+        return BytesInput(stdin)
+    if isinstance(stdin, (BytesInput, IterableInput, FileInput)):
+        return stdin
+    if isinstance(stdin, int):
+        return FileInput(stdin)
+    if hasattr(stdin, "read"):
+        try:
+            stdin.fileno()
+        except (AttributeError, IOError, OSError, ValueError):
+            # file-like objects without a descriptor, such as BytesIO
+            return IterableInput(iter(lambda: stdin.read(FILE_CHUNK_SIZE), b''))
+        return FileInput(stdin)
+    return IterableInput(stdin)
@@ -1,10 +1,22 @@
 import os
+import errno
+import heapq
+import itertools
 try:
     from gevent.select import select as select_unix
     from gevent import sleep
+    try:
+        from gevent.select import poll as poll_unix
+    except ImportError:
+        poll_unix = None
+    # epoll objects block the hub, gevent only offers a cooperative select/poll
+    epoll_unix = None
 except:
     from select import select as select_unix
     from time import sleep
+    import select as _select
+    poll_unix = getattr(_select, 'poll', None)
+    epoll_unix = getattr(_select, 'epoll', None)
 from .utils import _get_named_pipe_from_fileno
 
 # used by other modules
@@ -34,7 +46,7 @@ def select_windows(rlist, wlist, xlist, timeout, retry=True):
     for i in range(2):
         for fd in rlist:
             bytes_available = c_ulong(0)
-            handle = _get_named_pipe_from_fileno(fd.fileno())
+            handle = _get_named_pipe_from_fileno(fd if isinstance(fd, int) else fd.fileno())
             result = windll.kernel32.PeekNamedPipe(c_void_p(handle),        # _In_       HANDLE hNamedPipe,
                                                    None,                    # _Out_opt_  LPVOID lpBuffer,
                                                    c_ulong(0),              # _In_       DWORD nBufferSize,
@@ -58,14 +70,157 @@ def select(rlist, wlist, xlist, timeout):
     else:
         return select_windows(rlist, wlist, xlist, timeout)
 
-class IOLoop(object):
+
+# event bits, these match the values of POLLIN/POLLOUT/POLLERR/POLLHUP (and their EPOLL counterparts)
+READ = 0x001
+WRITE = 0x004
+ERROR = 0x008 | 0x010
+_POLLNVAL = 0x020
+# flush reads the pipes that are ready this many times at most, a pipe that is written as fast as we read it is
+# left to the loop
+MAX_FLUSH_ROUNDS = 16
+
+
+def _get_fileno(f):
+    return f if isinstance(f, int) else f.fileno()
+
+
+class EpollPoller(object):
+    """ readiness backend based on epoll(7): registrations live in the kernel, and the cost of an iteration
+    depends on the number of ready file descriptors rather than on the number of registered ones """
+    def __init__(self):
+        super(EpollPoller, self).__init__()
+        self._epoll = epoll_unix()
+
+    def register(self, fd, events):
+        self._epoll.register(fd, events)
+
+    def modify(self, fd, events):
+        self._epoll.modify(fd, events)
+
+    def unregister(self, fd):
+        self._epoll.unregister(fd)
+
+    def poll(self, timeout):
+        return self._epoll.poll(-1 if timeout is None else timeout)
+
+    def close(self):
+        self._epoll.close()
+
+
+class PollPoller(object):
+    """ readiness backend based on poll(2), not limited by FD_SETSIZE """
     def __init__(self):
+        super(PollPoller, self).__init__()
+        self._poll = poll_unix()
+
+    def register(self, fd, events):
+        self._poll.register(fd, events)
+
+    def modify(self, fd, events):
+        self._poll.modify(fd, events)
+
+    def unregister(self, fd):
+        self._poll.unregister(fd)
+
+    def poll(self, timeout):
+        return self._poll.poll(None if timeout is None else timeout * 1000)
+
+    def close(self):
+        pass
+
+
+class SelectPoller(object):
+    """ readiness backend based on select(2), used on Windows and where nothing better is available.
+    on Windows, readable file descriptors are returned as (fd, bytes_available) tuples, see select_windows """
+    def __init__(self):
+        super(SelectPoller, self).__init__()
+        self._events = {}
+
+    def register(self, fd, events):
+        self._events[fd] = events
+
+    def modify(self, fd, events):
+        self._events[fd] = events
+
+    def unregister(self, fd):
+        del self._events[fd]
+
+    def poll(self, timeout):
+        reads = [fd for fd, events in self._events.items() if events & READ]
+        writes = [fd for fd, events in self._events.items() if events & WRITE]
+        readable, writeable, _ = select(reads, writes, [], timeout)
+        return [(fd, READ) for fd in readable] + [(fd, WRITE) for fd in writeable]
+
+    def close(self):
+        self._events.clear()
+
+
+def get_default_poller_class():
+    if os.name == 'nt':
+        return SelectPoller
+    if epoll_unix is not None:
+        return EpollPoller
+    if poll_unix is not None:
+        return PollPoller
+    return SelectPoller
+
+
+def _wait_for_readable(files, timeout):
+    """ returns the files that are readable (or at EOF), waits up to timeout seconds for one of them """
+    poller = PollPoller() if poll_unix is not None else SelectPoller()
+    filenos = dict((_get_fileno(f), f) for f in files)
+    for fileno in filenos:
+        poller.register(fileno, READ)
+    try:
+        events = poller.poll(timeout)
+    except (IOError, OSError) as error:
+        if error.errno == errno.EINTR:
+            return []
+        raise
+    finally:
+        poller.close()
+    return [filenos[fileno] for fileno, event in events]
+
+
+class Timer(object):
+    """ a callback scheduled with IOLoop.call_at """
+    def __init__(self, when, sequence, callback):
+        super(Timer, self).__init__()
+        self.when = when
+        self._sequence = sequence
+        self._callback = callback
+
+    def cancel(self):
+        self._callback = None
+
+    def is_cancelled(self):
+        return self._callback is None
+
+    def __lt__(self, other):
+        return (self.when, self._sequence) < (other.when, other._sequence)
+
+
+class IOLoop(object):
+    def __init__(self, poller=None):
         super(IOLoop, self).__init__()
+        self._poller = poller if poller is not None else get_default_poller_class()()
         self.reset()
 
     def reset(self):
         self._reads = {}
         self._writes = {}
+        # changes to the registrations are applied to the poller lazily, right before polling, so a file
+        # that is unregistered and registered again within an iteration costs nothing in the kernel
+        self._filenos = {}
+        self._dirty = {}
+        self._registered = {}
+        # a heap of Timer objects, cancelled timers are dropped when they reach the top
+        self._timers = []
+        self._timer_sequence = itertools.count()
+
+    def close(self):
+        self._poller.close()
 
     def register_read(self, fd, handler):
         self._register(self._reads, fd, handler)
@@ -77,6 +232,38 @@ class IOLoop(object):
         if fd in collection:
             raise NotImplementedError("Multiple registrations on single file")
         collection[fd] = handler
+        fileno = self._filenos.get(fd)
+        if fileno is None:
+            fileno = self._filenos[fd] = _get_fileno(fd)
+        self._dirty[fileno] = fd
+
+    def call_at(self, when, callback):
+        """ calls callback() from the first iteration that ends after when (a point in ioloop.time),
+        the iterations don't wait longer than the earliest timer. returns a Timer, which can be cancelled """
+        timer = Timer(when, next(self._timer_sequence), callback)
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def _get_poll_timeout(self, timeout):
+        timers = self._timers
+        while timers and timers[0].is_cancelled():
+            heapq.heappop(timers)
+        if not timers:
+            return timeout
+        until_timer = max(0, timers[0].when - time())
+        return until_timer if timeout is None else min(timeout, until_timer)
+
+    def _run_timers(self):
+        timers = self._timers
+        if not timers:
+            return
+        current_time = time()
+        while timers and timers[0].when <= current_time:
+            timer = heapq.heappop(timers)
+            callback = timer._callback
+            if callback is not None:
+                timer.cancel()
+                callback()
 
     def unregister_read(self, fd):
         self._unregister(self._reads, fd)
@@ -88,37 +275,117 @@ class IOLoop(object):
         if fd not in collection:
             raise NotImplementedError("Unregistering non-registered file")
         collection.pop(fd)
+        self._forget(fd)
+
+    def _forget(self, fd):
+        if fd in self._reads or fd in self._writes:
+            return
+        fileno = self._filenos.pop(fd, None)
+        if fileno is None:
+            return
+        if isinstance(fd, int):
+            # a bare descriptor may be closed and reused before the next iteration, so we can't defer this
+            self._dirty.pop(fileno, None)
+            self._unregister_from_poller(fileno)
+        elif self._dirty.get(fileno) in (None, fd):
+            self._dirty[fileno] = fd
+
+    def _unregister_from_poller(self, fileno):
+        if self._registered.pop(fileno, None) is None:
+            return
+        try:
+            self._poller.unregister(fileno)
+        except (IOError, OSError, KeyError, ValueError):
+            # the file may already be closed (and its descriptor reused), which removes it from epoll
+            pass
+
+    def _sync_poller(self):
+        for fileno, fd in self._dirty.items():
+            events = (READ if fd in self._reads else 0) | (WRITE if fd in self._writes else 0)
+            current = self._registered.get(fileno)
+            if current is not None and (current[0] is not fd or not events):
+                self._unregister_from_poller(fileno)
+                current = None
+            if not events:
+                continue
+            if current is None:
+                self._poller.register(fileno, events)
+            elif current[1] != events:
+                self._poller.modify(fileno, events)
+            self._registered[fileno] = (fd, events)
+        self._dirty.clear()
+
+    def _poll(self, timeout):
+        self._sync_poller()
+        try:
+            return self._poller.poll(timeout)
+        except (IOError, OSError) as error:
+            if error.errno == errno.EINTR:
+                return []
+            raise
 
     def do_iteration(self, timeout=None):
-        reads, writes, _ = select(self._reads.keys(), self._writes.keys(), [], timeout)
-        for readable in list(reads):
-            self._handle_readable(readable)
-        for writeable in list(writes):
+        events = self._poll(self._get_poll_timeout(timeout))
+        reads, writes = [], []
+        for fileno, event in events:
+            count = -1
+            if isinstance(fileno, tuple):
+                fileno, count = fileno
+            registered = self._registered.get(fileno)
+            if registered is None:
+                continue
+            fd = registered[0]
+            if event & (READ | ERROR | _POLLNVAL) and fd in self._reads:
+                reads.append((fd, count))
+            if event & (WRITE | ERROR | _POLLNVAL) and fd in self._writes:
+                writes.append(fd)
+        for readable, count in reads:
+            self._handle_readable(readable, count)
+        for writeable in writes:
             self._handle_writeable(writeable)
+        self._run_timers()
         return reads or writes
 
-    def flush(self):
-        # read from the pipes until the end
-        # the process is finished (or killed) when this function is called
-        # we don't use do_iteration and instead call directly to the read handlers anyway -
-        # this is because PeekNamedPipe won't work now (the pipe is closed), and it's safe to
-        # read now that the pipes are closed, read will always finish and will never block
-        # The read handles will not be re-registered when they are exhausted
-        while self._reads:
-            [self._handle_readable(r) for r in list(self._reads.keys())]
-
-    def _handle_readable(self, f):
+    def flush(self, files=None):
+        """ reads what the pipes have without waiting, the process is finished (or killed) when this function is
+        called. the read handlers are called directly rather than through do_iteration, so it's safe to flush from
+        within an iteration (or from an event loop we don't drive). the handlers unregister themselves when they
+        are exhausted. the children of the process may hold the pipes after it exits, the pipes that are still
+        open are left to the iterations of the loop. returns False if some of the pipes are still open """
+        files = list(self._reads.keys()) if files is None else files
+        if os.name == 'nt':
+            # PeekNamedPipe won't work now (the pipe is closed), but read will always finish and will never block
+            return self._flush_windows(files)
+        for _ in range(MAX_FLUSH_ROUNDS):
+            pending = [f for f in files if f in self._reads]
+            if not pending:
+                return True
+            readable = _wait_for_readable(pending, 0)
+            if not readable:
+                return False
+            for f in readable:
+                self._handle_readable(f)
+        # the pipes are written faster than we read them
+        return not any(f in self._reads for f in files)
+
+    def _flush_windows(self, files):
+        while True:
+            pending = [f for f in files if f in self._reads]
+            if not pending:
+                return True
+            for f in pending:
+                self._handle_readable(f)
+
+    def _handle_readable(self, f, count=-1):
         """ because anonymous pipes in windows can be blocked, we need to pay attention
         on how much we read
+        handlers stay registered until they unregister themselves (usually on EOF)
         """
-        count = -1
-        if isinstance(f, tuple):
-            f, count = f
-        handler = self._reads.pop(f, None)
+        handler = self._reads.get(f)
         if handler is not None:
             handler(self, f, count=count)
 
     def _handle_writeable(self, f):
-        handler = self._writes.pop(f, None)
+        handler = self._writes.get(f)
         if handler is not None:
             handler(self, f)
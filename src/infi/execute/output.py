@@ -0,0 +1,284 @@
+""" handling of the output of the processes as it arrives
+
+output callbacks are called with every chunk read from the pipe, and with an empty chunk on EOF.
+capture policies decide how much of the output is retained by the Result: CaptureAll (the default),
+CaptureNothing, MaxBytes, HeadTail and SpillToFile
+"""
+import os
+import tempfile
+from collections import deque
+from io import BytesIO
+
+
+class LineSplitter(object):
+    """ wraps an output callback so it's called with complete lines (newline included) instead of chunks.
+    the last line is passed on EOF even if it doesn't end with a newline """
+    def __init__(self, callback):
+        super(LineSplitter, self).__init__()
+        self._callback = callback
+        self._pending = []
+
+    def __call__(self, chunk):
+        if not chunk:
+            if self._pending:
+                self._callback(b''.join(self._pending))
+                self._pending = []
+            self._callback(chunk)
+            return
+        index = chunk.find(b'\n')
+        if index == -1:
+            self._pending.append(chunk)
+            return
+        self._pending.append(chunk[:index + 1])
+        self._callback(b''.join(self._pending))
+        self._pending = []
+        start = index + 1
+        while True:
+            index = chunk.find(b'\n', start)
+            if index == -1:
+                break
+            self._callback(chunk[start:index + 1])
+            start = index + 1
+        if start < len(chunk):
+            self._pending.append(chunk[start:])
+
+
+class _Buffer(object):
+    """ retains all of the output in a single growing bytearray, the pipe is read straight into it
+    (see get_write_view), and the final bytes object is built once """
+    def __init__(self):
+        super(_Buffer, self).__init__()
+        self._data = bytearray()
+        self._used = 0
+        self._value = None
+
+    def get_write_view(self, size):
+        """ returns a writable memoryview of at least size bytes at the end of the data, see commit """
+        if len(self._data) - self._used < size:
+            grow = max(size, len(self._data))
+            try:
+                self._data.extend(bytes(grow))
+            except BufferError:
+                # someone holds a view from getbuffer, so we can't resize in place
+                self._data = self._data[:self._used] + bytes(grow)
+        return memoryview(self._data)[self._used:self._used + size]
+
+    def commit(self, count):
+        """ marks count bytes written to the view from get_write_view as part of the output """
+        self._used += count
+        self._value = None
+
+    def write(self, chunk):
+        count = len(chunk)
+        view = self.get_write_view(count)
+        view[:] = chunk
+        view.release()
+        self.commit(count)
+
+    def finish(self):
+        """ called on EOF, releases the spare capacity """
+        try:
+            del self._data[self._used:]
+        except BufferError:
+            pass
+
+    def getvalue(self):
+        if self._value is None:
+            with memoryview(self._data) as view:
+                self._value = bytes(view[:self._used])
+        return self._value
+
+    def getbuffer(self):
+        """ returns a read-only memoryview of the output without copying it """
+        return memoryview(self._data)[:self._used].toreadonly()
+
+    def get_size(self):
+        """ returns the number of bytes written, including the ones that were dropped """
+        return self._used
+
+    def get_dropped(self):
+        return 0
+
+    def get_preview(self, head, tail):
+        """ returns (first bytes, number of bytes omitted, last bytes) without copying the whole output """
+        size = self._used
+        if size <= head + tail:
+            return self.getvalue(), 0, b''
+        with memoryview(self._data) as view:
+            return bytes(view[:head]), size - head - tail, bytes(view[size - tail:size])
+
+
+class _NullBuffer(object):
+    def __init__(self):
+        super(_NullBuffer, self).__init__()
+        self._size = 0
+
+    def write(self, chunk):
+        self._size += len(chunk)
+
+    def getvalue(self):
+        return b''
+
+    def get_size(self):
+        return self._size
+
+    def finish(self):
+        pass
+
+    def get_dropped(self):
+        return self._size
+
+    def get_preview(self, head, tail):
+        return b'', self._size, b''
+
+
+class _HeadTailBuffer(object):
+    """ retains the first head bytes and the last tail bytes of the output """
+    def __init__(self, head, tail):
+        super(_HeadTailBuffer, self).__init__()
+        self._head = bytearray()
+        self._head_size = head
+        self._tail = deque()
+        self._tail_bytes = 0
+        self._tail_size = tail
+        self._size = 0
+
+    def write(self, chunk):
+        self._size += len(chunk)
+        room = self._head_size - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if not chunk or not self._tail_size:
+            return
+        # the chunk may be a view of a reused read buffer
+        self._tail.append(bytes(chunk))
+        self._tail_bytes += len(chunk)
+        # we keep whole chunks, so we drop a chunk only when the rest of the chunks are enough for the tail
+        while self._tail_bytes - len(self._tail[0]) >= self._tail_size:
+            self._tail_bytes -= len(self._tail.popleft())
+
+    def finish(self):
+        pass
+
+    def _get_tail(self):
+        tail = b''.join(self._tail)
+        return tail[len(tail) - min(len(tail), self._tail_size):]
+
+    def getvalue(self):
+        return bytes(self._head) + self._get_tail()
+
+    def get_size(self):
+        return self._size
+
+    def get_dropped(self):
+        return self._size - len(self._head) - min(self._tail_bytes, self._tail_size)
+
+    def get_preview(self, head, tail):
+        value = self.getvalue()
+        dropped = self.get_dropped()
+        if dropped == 0 and len(value) <= head + tail:
+            return value, 0, b''
+        head_part = value[:min(head, len(self._head))]
+        tail_part = value[len(value) - min(tail, len(value) - len(head_part)):]
+        return head_part, self._size - len(head_part) - len(tail_part), tail_part
+
+
+class _SpillBuffer(object):
+    """ retains the output in memory up to a threshold, and in a temporary file beyond it """
+    def __init__(self, threshold, dir=None):
+        super(_SpillBuffer, self).__init__()
+        self._threshold = threshold
+        self._dir = dir
+        self._memory = BytesIO()
+        self._file = None
+        self._size = 0
+
+    def write(self, chunk):
+        self._size += len(chunk)
+        if self._file is None and self._size > self._threshold:
+            self._file = tempfile.TemporaryFile(dir=self._dir)
+            self._file.write(self._memory.getvalue())
+            self._memory = None
+        if self._file is None:
+            self._memory.write(chunk)
+        else:
+            self._file.write(chunk)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def get_file(self):
+        """ returns the temporary file the output was spilled to, or None if it's kept in memory """
+        return self._file
+
+    def _read(self, offset, count):
+        self._file.flush()
+        self._file.seek(offset)
+        try:
+            return self._file.read(count)
+        finally:
+            self._file.seek(0, os.SEEK_END)
+
+    def getvalue(self):
+        if self._file is None:
+            return self._memory.getvalue()
+        return self._read(0, self._size)
+
+    def get_size(self):
+        return self._size
+
+    def get_dropped(self):
+        return 0
+
+    def get_preview(self, head, tail):
+        if self._size <= head + tail:
+            return self.getvalue(), 0, b''
+        if self._file is None:
+            value = self._memory.getbuffer()
+            try:
+                return bytes(value[:head]), self._size - head - tail, bytes(value[self._size - tail:])
+            finally:
+                value.release()
+        return self._read(0, head), self._size - head - tail, self._read(self._size - tail, tail)
+
+
+class CaptureAll(object):
+    """ the default capture policy, retains all of the output in memory """
+    def create_buffer(self):
+        return _Buffer()
+
+
+class CaptureNothing(object):
+    """ doesn't retain the output, only counts it. useful with output callbacks """
+    def create_buffer(self):
+        return _NullBuffer()
+
+
+class HeadTail(object):
+    """ retains the first head bytes and the last tail bytes of the output, the rest is dropped """
+    def __init__(self, head, tail):
+        super(HeadTail, self).__init__()
+        self.head = head
+        self.tail = tail
+
+    def create_buffer(self):
+        return _HeadTailBuffer(self.head, self.tail)
+
+
+class MaxBytes(HeadTail):
+    """ retains the first max_bytes bytes of the output, the rest is dropped """
+    def __init__(self, max_bytes):
+        super(MaxBytes, self).__init__(max_bytes, 0)
+
+
+class SpillToFile(object):
+    """ retains the output in memory up to threshold bytes, and in a temporary file beyond it """
+    def __init__(self, threshold, dir=None):
+        super(SpillToFile, self).__init__()
+        self.threshold = threshold
+        self.dir = dir
+
+    def create_buffer(self):
+        return _SpillBuffer(self.threshold, self.dir)
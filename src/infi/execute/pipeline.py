@@ -0,0 +1,104 @@
+""" pipelines of processes connected with kernel pipes (see Runner.pipeline_async)
+
+the output of every stage is passed to the next stage by the kernel, only the output of the last stage
+(and the stderr of the stages) passes through the ioloop, and only when it's captured
+"""
+import signal
+from .waiting import wait_for_many_results
+from .exceptions import CommandTimeout, ExecutionError
+
+
+class PipelineResult(object):
+    def __init__(self, results, assert_success, pipefail=False):
+        """ results are the Result objects of the stages, in order.
+        with pipefail=True the pipeline fails if any of the stages fails, otherwise only the last stage counts """
+        super(PipelineResult, self).__init__()
+        self._results = results
+        self._assert_success = assert_success
+        self._pipefail = pipefail
+
+    def get_results(self):
+        return list(self._results)
+
+    def get_returncodes(self):
+        return [result.get_returncode() for result in self._results]
+
+    def get_returncode(self):
+        """ returns None until all of the stages have exited """
+        returncodes = self.get_returncodes()
+        if None in returncodes:
+            return None
+        if self._pipefail:
+            return next((returncode for returncode in reversed(returncodes) if returncode != 0), 0)
+        return returncodes[-1]
+
+    def get_deadline(self):
+        return self._results[-1].get_deadline()
+
+    def get_pid(self):
+        return self._results[-1].get_pid()
+
+    def kill(self, sig=signal.SIGTERM):
+        for result in self._results:
+            result.kill(sig)
+
+    def poll(self):
+        for result in self._results:
+            result.poll()
+        self._check_return_code()
+        return self.get_returncode()
+
+    def is_finished(self):
+        return self.poll() is not None
+
+    def _get_failed_result(self):
+        if not self._pipefail:
+            return self._results[-1] if self._results[-1].get_returncode() != 0 else None
+        return next((result for result in reversed(self._results) if result.get_returncode() != 0), None)
+
+    def _check_return_code(self):
+        if not self._assert_success or self.get_returncode() is None:
+            return
+        failed = self._get_failed_result()
+        if failed is not None:
+            raise ExecutionError(failed)
+
+    def wait(self, timeout=None):
+        returned_results = wait_for_many_results(self._results, timeout=timeout)
+        returned = None not in returned_results
+        if not returned and (self.get_deadline() or timeout):
+            for result in self._results:
+                result._report_timeout()
+            for result in self._results:
+                result._wait_for_kill()
+            raise CommandTimeout(self._results[-1])
+        timed_out = [result for result in self._results if result.has_timed_out()]
+        if timed_out:
+            # the deadline passed during the wait, and the kill policy ended the stages
+            raise CommandTimeout(timed_out[-1])
+        if returned:
+            self._check_return_code()
+        return returned
+
+    def __await__(self):
+        from .aio import completed_pipeline
+        return completed_pipeline(self).__await__()
+
+    def __repr__(self):
+        return "<pipeline %s>" % " | ".join(repr(result) for result in self._results)
+
+    def get_stdout(self):
+        return self._results[-1].get_stdout()
+
+    def get_stderr(self):
+        """ returns the stderr of all of the stages """
+        return b"".join(result.get_stderr() for result in self._results)
+
+    def get_stdout_view(self):
+        return self._results[-1].get_stdout_view()
+
+    def get_stdout_capture(self):
+        return self._results[-1].get_stdout_capture()
+
+    def iter_stdout(self, lines=False):
+        return self._results[-1].iter_stdout(lines=lines)
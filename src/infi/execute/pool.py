@@ -0,0 +1,130 @@
+""" bounded-concurrency execution of many commands (see Runner.execute_many and Runner.map)
+
+the pool starts commands as slots free up, so only max_parallel processes (and their pipes) exist at once,
+and the commands are taken from the given iterable lazily
+"""
+import signal
+from collections import deque
+from itertools import chain
+from .ioloop import time
+from .waiting import wait_for_many_results, wait_for_any_exit, FIRST_COMPLETED
+
+DEFAULT_MAX_PARALLEL = 64
+_KILL_SIGNAL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+
+class ExecutionPool(object):
+    def __init__(self, max_parallel=DEFAULT_MAX_PARALLEL, max_per_host=None, start_callback=None):
+        """ runs at most max_parallel commands at once, and at most max_per_host commands on every host of
+        the SSH runners. start_callback is called with every result as its command is started """
+        super(ExecutionPool, self).__init__()
+        self._max_parallel = max_parallel
+        self._max_per_host = max_per_host
+        self._start_callback = start_callback
+        self._queue = deque()
+        self._blocked = deque()
+        self._running = []
+        self._hosts = {}
+        # the results we killed after their deadline, they are collected once their pipes are drained
+        self._killed = set()
+
+    def submit(self, runner, *args, **kwargs):
+        """ queues runner.execute_async(*args, **kwargs), the command is started by as_completed """
+        self._queue.append((runner, args, kwargs))
+
+    def as_completed(self, jobs=()):
+        """ yields the results as they finish. jobs is an optional iterable of (runner, args, kwargs),
+        consumed after the submitted jobs. commands that pass their timeout are killed, and yielded once reaped """
+        for job, result in self.as_completed_jobs(jobs):
+            yield result
+
+    def as_completed_jobs(self, jobs=()):
+        """ like as_completed, but yields (job, result) pairs, so the results can be told apart """
+        jobs = chain(self._iter_queue(), jobs)
+        while True:
+            self._start_jobs(jobs)
+            if not self._running:
+                return
+            for item in self._wait_for_finished():
+                yield item
+
+    def _iter_queue(self):
+        while self._queue:
+            yield self._queue.popleft()
+
+    def _get_host(self, runner):
+        return getattr(runner, "host", None)
+
+    def _has_room(self, runner):
+        host = self._get_host(runner)
+        return self._max_per_host is None or host is None or self._hosts.get(host, 0) < self._max_per_host
+
+    def _get_next_job(self, jobs):
+        for job in self._blocked:
+            if self._has_room(job[0]):
+                self._blocked.remove(job)
+                return job
+        # jobs for busy hosts are put aside, but we don't read too far ahead
+        while len(self._blocked) < self._max_parallel:
+            job = next(jobs, None)
+            if job is None:
+                return None
+            if self._has_room(job[0]):
+                return job
+            self._blocked.append(job)
+        return None
+
+    def _start_jobs(self, jobs):
+        while len(self._running) < self._max_parallel:
+            job = self._get_next_job(jobs)
+            if job is None:
+                return
+            runner, args, kwargs = job
+            result = runner.execute_async(*args, **kwargs)
+            host = self._get_host(runner)
+            self._hosts[host] = self._hosts.get(host, 0) + 1
+            self._running.append((result, host, job))
+            if self._start_callback is not None:
+                self._start_callback(result)
+
+    def _kill_overdue_results(self):
+        current_time = time()
+        overdue = [result for result, host, job in self._running if result not in self._killed and
+                   result.get_deadline() is not None and result.get_deadline() <= current_time]
+        for result in overdue:
+            result._report_timeout()
+            result.kill(_KILL_SIGNAL)
+            self._killed.add(result)
+        while overdue:
+            exited = wait_for_any_exit(overdue)
+            for result in exited:
+                # starts draining the pipes, the result is collected once they are closed
+                result.poll()
+            overdue = [result for result in overdue if result not in exited]
+
+    def _get_wait_timeout(self, running):
+        """ the past deadlines of the results we killed would make every wait return right away while their pipes
+        are drained, so they are left out """
+        deadlines = [result.get_deadline() for result in running
+                     if result.get_deadline() is not None and result not in self._killed]
+        return max(0, min(deadlines) - time()) if deadlines else None
+
+    def _wait_for_finished(self):
+        running = [result for result, host, job in self._running]
+        finished = [result for result in wait_for_many_results(running, timeout=self._get_wait_timeout(running),
+                                                               return_when=FIRST_COMPLETED, use_deadlines=False)
+                    if result is not None]
+        if not finished:
+            self._kill_overdue_results()
+            return []
+        still_running = []
+        finished_jobs = []
+        for result, host, job in self._running:
+            if result in finished:
+                self._hosts[host] -= 1
+                self._killed.discard(result)
+                finished_jobs.append((job, result))
+            else:
+                still_running.append((result, host, job))
+        self._running = still_running
+        return finished_jobs
@@ -0,0 +1,238 @@
+""" a background thread that waits for the results of all of the threads, with concurrent.futures integration
+
+    >>> future = local.submit(["sleep", "1"])
+    >>> result = future.result()          # blocks on a condition variable, not in a polling loop
+
+every thread that waits with Result.wait runs an ioloop of its own. with the reactor, a single thread owns the
+pipes and the exit notifications of the submitted results, and completes a concurrent.futures.Future for every
+result, so any number of threads can wait (or use concurrent.futures.wait and as_completed) without polling.
+once a result is submitted, it belongs to the reactor thread: it should be used only after its future is done
+"""
+import os
+import errno
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from .ioloop import IOLoop
+from .waiting import DEFAULT_SAMPLE_INTERVAL, SIGCHLD_SAMPLE_INTERVAL
+from .child_exit import sigchld_wakeup, drain_fd
+from .utils import make_fd_non_blocking
+from .exceptions import CommandTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class _ReactorIOLoop(IOLoop):
+    """ an error in a handler or a timer is passed to handle_error(owner, error) rather than stopping the loop,
+    the owner is the object of the handler (the Result, for its pipes and timers) """
+    def __init__(self, handle_error):
+        super(_ReactorIOLoop, self).__init__()
+        self._handle_error = handle_error
+
+    def _handle_readable(self, f, count=-1):
+        handler = self._reads.get(f)
+        try:
+            super(_ReactorIOLoop, self)._handle_readable(f, count)
+        except Exception as error:
+            self._handle_error(getattr(handler, "__self__", None), error)
+
+    def _handle_writeable(self, f):
+        handler = self._writes.get(f)
+        try:
+            super(_ReactorIOLoop, self)._handle_writeable(f)
+        except Exception as error:
+            self._handle_error(getattr(handler, "__self__", None), error)
+
+    def call_at(self, when, callback):
+        def call():
+            try:
+                callback()
+            except Exception as error:
+                self._handle_error(getattr(callback, "__self__", None), error)
+        return super(_ReactorIOLoop, self).call_at(when, call)
+
+
+class Reactor(object):
+    def __init__(self):
+        super(Reactor, self).__init__()
+        self._lock = threading.Lock()
+        self._submitted = deque()
+        self._watched = {}
+        self._ioloop = None
+        self._thread = None
+        self._closing = False
+        self._wakeup_read_fd = self._wakeup_write_fd = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._closing = False
+            self._ioloop = _ReactorIOLoop(self._handle_error)
+            self._wakeup_read_fd, self._wakeup_write_fd = os.pipe()
+            make_fd_non_blocking(self._wakeup_read_fd)
+            make_fd_non_blocking(self._wakeup_write_fd)
+            self._thread = threading.Thread(target=self._run, name="infi.execute reactor")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def close(self):
+        """ stops the thread, the futures of the results that are still running are never completed """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._closing = True
+        self._wake_up()
+        thread.join()
+        for fd in (self._wakeup_read_fd, self._wakeup_write_fd):
+            os.close(fd)
+        self._ioloop.close()
+        self._submitted.clear()
+        self._watched.clear()
+
+    def submit(self, result):
+        """ returns a Future of the result: its result is the Result once the process is finished and its
+        output was read, and its exception is ExecutionError (with assert_success) or CommandTimeout """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        ioloop = result.get_ioloop()
+        if ioloop is not None:
+            # registered to the ioloop of this thread, which isn't running now
+            result.unregister_from_ioloop(ioloop)
+        with self._lock:
+            self._submitted.append((result, future))
+        # after we queue the result, so if the thread fails meanwhile, the future fails with it
+        self.start()
+        self._wake_up()
+        return future
+
+    def _wake_up(self):
+        try:
+            os.write(self._wakeup_write_fd, b'\0')
+        except OSError as error:
+            if error.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+            # a wakeup is already pending
+
+    def _run(self):
+        # a new thread may replace these if this one fails
+        ioloop, wakeup_read_fd, wakeup_write_fd = self._ioloop, self._wakeup_read_fd, self._wakeup_write_fd
+        ioloop.register_read(wakeup_read_fd, self._handle_wakeup)
+        sigchld_fd = sigchld_wakeup.subscribe()
+        if sigchld_fd is not None:
+            ioloop.register_read(sigchld_fd, self._handle_wakeup)
+        aborted = False
+        try:
+            while not self._closing:
+                self._accept_submitted()
+                self._sweep()
+                ioloop.do_iteration(self._get_sample_interval(sigchld_fd))
+        except Exception as error:
+            logger.exception("the reactor thread failed")
+            self._abort(error)
+            aborted = True
+        finally:
+            ioloop.unregister_read(wakeup_read_fd)
+            if sigchld_fd is not None:
+                ioloop.unregister_read(sigchld_fd)
+                sigchld_wakeup.unsubscribe(sigchld_fd)
+        if aborted:
+            # close isn't called for this thread
+            for fd in (wakeup_read_fd, wakeup_write_fd):
+                os.close(fd)
+            ioloop.close()
+
+    def _abort(self, error):
+        """ the futures of the results fail with the error, and the next submit starts a new thread """
+        with self._lock:
+            self._thread = None
+            submitted, self._submitted = self._submitted, deque()
+            watched, self._watched = self._watched, {}
+        for future in [future for _, future in submitted] + list(watched.values()):
+            if not future.done():
+                future.set_exception(error)
+
+    def _get_sample_interval(self, sigchld_fd):
+        if all(result.has_exit_notification() for result in self._watched):
+            return None
+        return DEFAULT_SAMPLE_INTERVAL if sigchld_fd is None else SIGCHLD_SAMPLE_INTERVAL
+
+    def _handle_wakeup(self, ioloop, f, count=-1):
+        drain_fd(f)
+
+    def _accept_submitted(self):
+        with self._lock:
+            submitted, self._submitted = self._submitted, deque()
+        for result, future in submitted:
+            self._watched[result] = future
+            try:
+                result.register_to_ioloop(self._ioloop)
+            except Exception as error:
+                self._handle_error(result, error)
+                continue
+            deadline = result.get_deadline()
+            if deadline is not None:
+                self._ioloop.call_at(deadline, lambda result=result: self._handle_deadline(result))
+
+    def _handle_error(self, result, error):
+        """ fails the future of the result, which isn't handled by the reactor anymore """
+        future = self._watched.pop(result, None)
+        if future is None:
+            # not a handler of a result, we don't know who to tell
+            logger.exception("error in the reactor thread")
+            return
+        result.unregister_from_ioloop(self._ioloop)
+        if not future.done():
+            future.set_exception(error)
+
+    def _handle_deadline(self, result):
+        future = self._watched.get(result)
+        if future is None or future.done():
+            return
+        try:
+            if not result.has_exited():
+                # like Result.wait, the process keeps running unless it has a kill policy, and we keep reading its
+                # output and reap it when it exits
+                result._report_timeout()
+        except Exception as error:
+            self._handle_error(result, error)
+            return
+        # the deadline timer of the result may have applied the kill policy already
+        if result.has_timed_out():
+            future.set_exception(CommandTimeout(result))
+
+    def _sweep(self):
+        for result, future in list(self._watched.items()):
+            if not result.is_exit_signaled():
+                # we'll be woken up by the pidfd when the process exits
+                continue
+            try:
+                finished = result.is_finished()
+            except Exception as error:
+                finished, exception = True, error
+            else:
+                exception = CommandTimeout(result) if result.has_timed_out() else None
+            if not finished:
+                continue
+            del self._watched[result]
+            if future.done():
+                continue
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
+
+
+_reactor = Reactor()
+
+
+def get_reactor():
+    """ returns the reactor of the process, its thread is started on the first submit """
+    return _reactor
+
+
+def submit(result):
+    """ returns a concurrent.futures.Future of the result, see Reactor.submit """
+    return _reactor.submit(result)
@@ -1,13 +1,16 @@
-from .waiting import wait_for_many_results, flush
+from .waiting import get_ioloop, wait_for_many_results, wait_for_activity, wait_for_any_exit, flush
 from .exceptions import CommandTimeout
 from .exceptions import ExecutionError
-from .utils import make_fd_non_blocking, non_blocking_read, non_blocking_write
-try:
-    from cStringIO import StringIO as BytesIO
-except ImportError:
-    from io import BytesIO
+from .utils import make_fd_non_blocking, non_blocking_readinto, set_pipe_size, waitstatus_to_returncode
+from .stats import ExecutionStats, get_max_rss
+from . import events
+from .child_exit import open_pidfd
+from .output import LineSplitter, CaptureAll, CaptureNothing
+from .input import create_input
 import os
+import errno
 import signal
+from collections import deque
 
 from .ioloop import time, sleep
 
@@ -23,31 +26,157 @@ class _LazyDecode:
         return self.bytes_.decode("utf-8").strip("\n")
 
 
-MAX_INPUT_CHUNK_SIZE = 1024
+# logging every chunk of output is costly, so it's opt-in: set LOG_OUTPUT to True and enable DEBUG on this logger
+LOG_OUTPUT = False
+# output is read in chunks that start small and grow while the process keeps the pipe full
+MIN_READ_SIZE = 4096
+MAX_READ_SIZE = 1024 * 1024
+MAX_READS_PER_EVENT = 16
+DEFAULT_PIPE_SIZE = 65536
+# how long we keep reading the output after the process exited, in case its children still hold the pipes
+DRAIN_TIMEOUT = 1.0
+
+
+class KillPolicy(object):
+    """ what happens to a process when its deadline passes: it gets first_signal, and if it's still running
+    grace_period seconds later, it gets SIGKILL. the timers run in the ioloop, and the process is reaped once
+    it exits """
+    def __init__(self, grace_period=5, first_signal=signal.SIGTERM):
+        super(KillPolicy, self).__init__()
+        self.grace_period = grace_period
+        self.first_signal = first_signal
+
+    def __repr__(self):
+        return "<KillPolicy: signal {0}, SIGKILL after {1}s>".format(self.first_signal, self.grace_period)
+
 
 class Result(object):
-    def __init__(self, command, popen, stdin, assert_success, timeout):
+    def __init__(self, command, popen, stdin, assert_success, timeout,
+                 stdout_callback=None, stderr_callback=None, capture_output=True, capture=None, spawn_time=None,
+                 kill_policy=None, new_session=False):
+        """ the output callbacks are called with every chunk of output as it arrives, and with b'' on EOF.
+        capture is the policy for retaining the output (see infi.execute.output), the default retains everything.
+        with capture_output=False the output is not retained, and get_stdout/get_stderr return b''.
+        spawn_time is how long it took to start the process, for get_stats.
+        with a kill_policy (see KillPolicy), the process is stopped when its deadline passes.
+        new_session means the process leads a process group of its own, and it's signaled as a group """
         super(Result, self).__init__()
+        self._spawn_time = spawn_time
+        self._start_time = time() - (spawn_time or 0)
+        self._exit_time = None
+        self._exit_reported = False
+        # while the output is drained after the process exited
+        self._drain_deadline = None
+        self._rusage = None
+        self._can_wait4 = hasattr(os, "wait4")
         self._command = command
         self._popen = popen
-        self._output = BytesIO()
-        self._input = BytesIO(stdin or b'')
-        self._error = BytesIO()
+        if not capture_output:
+            capture = CaptureNothing()
+        elif capture is None:
+            capture = CaptureAll()
+        self._output = capture.create_buffer()
+        self._input = create_input(stdin)
+        self._error = capture.create_buffer()
+        self._scratch = None
+        self._read_sizes = {}
+        self._pipe_sizes = {}
+        self._stdout_callbacks = [stdout_callback] if stdout_callback is not None else []
+        self._log_output = LOG_OUTPUT and logger.isEnabledFor(logging.DEBUG)
+        self._stderr_callbacks = [stderr_callback] if stderr_callback is not None else []
         self._assert_success = assert_success
         self._deadline = None
         if timeout is not None:
             self._deadline = time() + timeout
-        make_fd_non_blocking(self._popen.stdout.fileno())
-        make_fd_non_blocking(self._popen.stderr.fileno())
+        self._kill_policy = kill_policy
+        self._new_session = new_session
+        self._timed_out = False
+        self._timeout_reported = False
+        # the deadline, and then the time of the SIGKILL, are kept as a timer in the ioloop
+        self._kill_time = None
+        self._timer = None
+        # the output pipes are missing when the output is redirected
+        for pipe in (self._popen.stdout, self._popen.stderr):
+            if pipe is not None:
+                make_fd_non_blocking(pipe.fileno())
+        if self._popen.stdin is not None:
+            self._prepare_stdin()
+        self._exit_fd = self._open_exit_fd()
+        self._exit_signaled = False
+        self._ioloop = None
+        if kill_policy is not None and self._deadline is not None:
+            # the deadline is enforced by whichever wait runs the ioloop of this thread, not only by our own
+            self.register_to_ioloop(get_ioloop())
+    def __del__(self):
+        self._close_exit_fd()
+    def _open_exit_fd(self):
+        if os.name == 'nt' or self._popen.returncode is not None:
+            return None
+        # processes that are not our children (see infi.execute.spawn) provide their own descriptor
+        open_exit_fd = getattr(self._popen, "open_exit_fd", None)
+        exit_fd = open_exit_fd() if open_exit_fd is not None else None
+        return exit_fd if exit_fd is not None else open_pidfd(self._popen.pid)
     def get_deadline(self):
         return self._deadline
     def get_returncode(self):
         return self._popen.returncode
-    def kill(self, sig=signal.SIGTERM):
-        if not self.is_finished():
-            os.kill(self.get_pid(), sig)
+    def kill(self, sig=signal.SIGTERM, grace_period=None):
+        """ with grace_period, the process gets SIGKILL if it's still running grace_period seconds later
+        (while the ioloop runs, e.g. in wait) """
+        if self._is_running():
+            self._send_signal(sig)
+            if grace_period is not None:
+                self._kill_time = time() + grace_period
+                self._schedule_timer()
             sleep(0)
 
+    def _send_signal(self, sig):
+        if not self._new_session:
+            os.kill(self.get_pid(), sig)
+        else:
+            try:
+                os.killpg(self.get_pid(), sig)
+            except OSError as error:
+                if error.errno != errno.ESRCH:
+                    raise
+                # the process and all of its children are gone
+        if events.listeners:
+            events.emit("killed", self, sig)
+
+    def _get_timer_time(self):
+        if self._drain_deadline is not None:
+            return self._drain_deadline
+        if self._kill_time is not None:
+            return self._kill_time
+        return None if self._timed_out else self._deadline
+
+    def _schedule_timer(self):
+        self._cancel_timer()
+        when = self._get_timer_time()
+        if self._ioloop is not None and when is not None and \
+                (self._popen.returncode is None or self._drain_deadline is not None):
+            self._timer = self._ioloop.call_at(when, self._handle_timer)
+
+    def _cancel_timer(self):
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def _handle_timer(self):
+        self._timer = None
+        if self._drain_deadline is not None:
+            # the children of the process still hold the pipes, the next poll finishes the result
+            self._abandon_output()
+            return
+        if not self._is_running():
+            return
+        if self._kill_time is not None and self._kill_time <= time():
+            self._kill_time = None
+            self._send_signal(getattr(signal, "SIGKILL", signal.SIGTERM))
+        elif not self._timed_out and self._deadline is not None and self._deadline <= time():
+            self._report_timeout()
+        self._schedule_timer()
+
     @property
     def _command_str(self):
         if isinstance(self._command, str):
@@ -58,95 +187,381 @@ class Result(object):
             return self._command
 
     def register_to_ioloop(self, ioloop):
+        """ the handlers stay registered until their pipe is exhausted or the process is reaped """
+        if self._ioloop is ioloop:
+            return
+        if self._ioloop is not None:
+            self.unregister_from_ioloop(self._ioloop)
+        self._ioloop = ioloop
         if self._popen.stdout is not None:
-            self._register_stdout(ioloop)
+            ioloop.register_read(self._popen.stdout, self._handle_stdout)
         if self._popen.stderr is not None:
-            self._register_stderr(ioloop)
+            ioloop.register_read(self._popen.stderr, self._handle_stderr)
         if self._popen.stdin is not None:
-            self._register_stdin(ioloop)
-
-    def _register_stdin(self, ioloop):
-        ioloop.register_write(self._popen.stdin, self._handle_stdin)
-
-    def _register_stdout(self, ioloop):
-        ioloop.register_read(self._popen.stdout, self._handle_stdout)
-
-    def _register_stderr(self, ioloop):
-        ioloop.register_read(self._popen.stderr, self._handle_stderr)
+            ioloop.register_write(self._popen.stdin, self._handle_stdin)
+        if self._exit_fd is not None and not self._exit_signaled:
+            ioloop.register_read(self._exit_fd, self._handle_exit)
+        self._schedule_timer()
 
     def unregister_from_ioloop(self, ioloop):
+        if self._ioloop is not ioloop:
+            return
         if self._popen.stdout is not None:
             ioloop.unregister_read(self._popen.stdout)
         if self._popen.stderr is not None:
             ioloop.unregister_read(self._popen.stderr)
         if self._popen.stdin is not None:
             ioloop.unregister_write(self._popen.stdin)
+        if self._exit_fd is not None and not self._exit_signaled:
+            ioloop.unregister_read(self._exit_fd)
+        self._cancel_timer()
+        self._ioloop = None
+
+    def get_ioloop(self):
+        return self._ioloop
+
+    def get_output_pipes(self):
+        return [f for f in (self._popen.stdout, self._popen.stderr) if f is not None]
+
+    def has_exit_notification(self):
+        """ returns True if the ioloop wakes up when the process exits, so there's no need to poll it """
+        return self._exit_fd is not None or self.get_returncode() is not None
+
+    def is_exit_signaled(self):
+        return self._exit_signaled or self._exit_fd is None
+
+    def _close_exit_fd(self):
+        exit_fd, self._exit_fd = getattr(self, "_exit_fd", None), None
+        if exit_fd is None:
+            return
+        if self._ioloop is not None and not self._exit_signaled:
+            self._ioloop.unregister_read(exit_fd)
+        self._exit_signaled = True
+        os.close(exit_fd)
+
+    def _prepare_stdin(self):
+        fd = self._popen.stdin.fileno()
+        make_fd_non_blocking(fd)
+        size_hint = self._input.size_hint
+        if size_hint is None or size_hint > DEFAULT_PIPE_SIZE:
+            # large inputs are written in fewer, larger writes
+            set_pipe_size(fd, MAX_READ_SIZE)
+
+    def _close_stdin(self):
+        if self._popen.stdin is None:
+            return
+        self._input.close()
+        if self._ioloop is not None:
+            self._ioloop.unregister_write(self._popen.stdin)
+        try:
+            self._popen.stdin.close()
+        except (IOError, OSError):
+            # the process exited before reading all of its input
+            pass
+        self._popen.stdin = None
 
     def _handle_stdout(self, ioloop, f, count=-1):
         """ because anonymous pipes in windows can be blocked, we need to pay attention
         on how much we read
         """
-        output = non_blocking_read(self._popen.stdout, count)
-        if not output:
+        if not self._read_output(self._popen.stdout, self._output, self._stdout_callbacks, count):
+            ioloop.unregister_read(f)
             self._popen.stdout.close()
             self._popen.stdout = None
+
+    def _read_output(self, pipe, buffer, callbacks, count):
+        """ reads what's available in the pipe, returns False on EOF.
+        the read size grows while the reads fill it (and the pipe capacity grows with it), and the pipe is
+        drained until it's empty, so a high-volume process costs few wakeups """
+        if count >= 0:
+            # on Windows, PeekNamedPipe told us exactly how much we can read without blocking
+            return self._read_chunk(pipe, buffer, callbacks, count, True) != 0
+        size = self._read_sizes.get(pipe, MIN_READ_SIZE)
+        read = self._read_chunk(pipe, buffer, callbacks, size, True)
+        reads = 1
+        while read == size and reads < MAX_READS_PER_EVENT:
+            size = self._grow_read_size(pipe, size)
+            read = self._read_chunk(pipe, buffer, callbacks, size, False)
+            reads += 1
+        self._read_sizes[pipe] = size
+        # None means the pipe is drained, not EOF
+        return read != 0
+
+    def _grow_read_size(self, pipe, size):
+        new_size = min(size * 2, MAX_READ_SIZE)
+        if new_size > DEFAULT_PIPE_SIZE:
+            # reading more than the pipe can hold is pointless, so we try to raise its capacity (once)
+            pipe_size = self._pipe_sizes.get(pipe)
+            if pipe_size is None:
+                pipe_size = self._pipe_sizes[pipe] = set_pipe_size(pipe.fileno(), MAX_READ_SIZE) or DEFAULT_PIPE_SIZE
+            new_size = max(size, min(new_size, pipe_size))
+        return new_size
+
+    def _read_chunk(self, pipe, buffer, callbacks, size, retry):
+        """ reads a chunk into the capture buffer, returns the number of bytes read (0 on EOF, None if empty).
+        buffers that support it are read into directly, the rest are written from a reused scratch buffer,
+        so the only copy of the output is from the pipe to its final place. callbacks get a bytes copy """
+        get_write_view = getattr(buffer, "get_write_view", None)
+        if get_write_view is not None:
+            view = get_write_view(size)
         else:
-            logger.debug("[%s] %s", self._command_str, _LazyDecode(output))
-            self._output.write(output)
-            self._register_stdout(ioloop)
+            if self._scratch is None or len(self._scratch) < size:
+                self._scratch = bytearray(size)
+            view = memoryview(self._scratch)[:size]
+        with view:
+            read = non_blocking_readinto(pipe, view, retry)
+            if read is None:
+                return None
+            if not read:
+                buffer.finish()
+                for callback in callbacks:
+                    callback(b'')
+                return 0
+            with view[:read] as chunk:
+                if get_write_view is not None:
+                    buffer.commit(read)
+                else:
+                    buffer.write(chunk)
+                if events.listeners:
+                    self._emit_chunk(buffer, read)
+                if callbacks or self._log_output:
+                    output = chunk.tobytes()
+                    if self._log_output:
+                        logger.debug("[%s] %s", self._command_str, _LazyDecode(output))
+                    for callback in callbacks:
+                        callback(output)
+        return read
+
+    def _emit_chunk(self, buffer, size):
+        stream = "stdout" if buffer is self._output else "stderr"
+        if buffer.get_size() == size:
+            events.emit("first_byte", self, stream)
+        events.emit("chunk", self, stream, size)
 
     def _handle_stdin(self, ioloop, f):
-        input = self._input.read(MAX_INPUT_CHUNK_SIZE)
-        non_blocking_write(self._popen.stdin, input)
-        if len(input) < MAX_INPUT_CHUNK_SIZE:
-            self._popen.stdin.close()
-            self._popen.stdin = None
-        else:
-            self._register_stdin(ioloop)
+        try:
+            exhausted = self._input.write_to(self._popen.stdin.fileno())
+        except (IOError, OSError) as error:
+            if error.errno != errno.EPIPE:
+                raise
+            # the process exited or closed its stdin before reading all of its input
+            exhausted = True
+        if exhausted:
+            self._close_stdin()
+
+    def _abandon_output(self):
+        """ stops reading the output pipes, which are held open by the children of the process after it exited """
+        logger.debug("[%s] the output pipes are still open after exit, the rest is discarded", self._command_str)
+        for name, buffer, callbacks in (("stdout", self._output, self._stdout_callbacks),
+                                        ("stderr", self._error, self._stderr_callbacks)):
+            pipe = getattr(self._popen, name)
+            if pipe is None:
+                continue
+            if self._ioloop is not None:
+                self._ioloop.unregister_read(pipe)
+            pipe.close()
+            setattr(self._popen, name, None)
+            buffer.finish()
+            for callback in callbacks:
+                callback(b'')
+
+    def _handle_exit(self, ioloop, f, count=-1):
+        # the pidfd stays readable once the process is terminated
+        ioloop.unregister_read(f)
+        self._exit_signaled = True
+        # reaping right away records the exit time, and leaves no zombie behind if nobody waits for the result
+        self._reap()
 
     def _handle_stderr(self, ioloop, f, count=-1):
         """ because anonymous pipes in windows can be blocked, we need to pay attention
         on how much we read
         """
-        output = non_blocking_read(self._popen.stderr, count)
-        if not output:
+        if not self._read_output(self._popen.stderr, self._error, self._stderr_callbacks, count):
+            ioloop.unregister_read(f)
             self._popen.stderr.close()
             self._popen.stderr = None
-        else:
-            logger.debug("[%s] %s", self._command_str, _LazyDecode(output))
-            self._error.write(output)
-            self._register_stderr(ioloop)
+
+    def _reap(self):
+        """ reaps the process with wait4 when we can, to collect its resource usage """
+        if self._popen.returncode is None and self._can_wait4:
+            try:
+                pid, status, rusage = os.wait4(self._popen.pid, os.WNOHANG)
+            except OSError as error:
+                if error.errno != errno.ECHILD:
+                    raise
+                # not our child, or reaped by someone else (like the gevent child watcher)
+                self._can_wait4 = False
+            else:
+                if pid == self._popen.pid:
+                    self._popen.returncode = waitstatus_to_returncode(status)
+                    self._rusage = rusage
+        returncode = self._popen.poll()
+        if returncode is not None and self._exit_time is None:
+            self._exit_time = time()
+        return returncode
 
     def poll(self):
-        self._popen.poll()
+        """ returns None until the process exited and its output was read """
+        self._reap()
         self._check_return_code()
-        return self.get_returncode()
+        return self.get_returncode() if self._exit_reported else None
 
     def _check_return_code(self):
         returncode = self.get_returncode()
-        if returncode is not None:
-            flush(self)
-        if self._assert_success and returncode is not None and returncode != 0:
+        if returncode is None:
+            return
+        if not self._exit_reported:
+            if not self._drain_output():
+                return
+            # from now on, polling the result doesn't do anything
+            self._exit_reported = True
+            if events.listeners:
+                events.emit("exited", self)
+        if self._assert_success and returncode != 0:
             raise ExecutionError(self)
 
+    def _drain_output(self):
+        """ reads the output that is ready without waiting, returns False while the pipes are still open.
+        the rest is read by the ioloop, until the pipes are closed or the drain deadline passes: DRAIN_TIMEOUT
+        seconds after the exit (or the deadline of the process, if it's earlier) """
+        if self._drain_deadline is None:
+            self._cancel_timer()
+            self._close_exit_fd()
+            self._close_stdin()
+            current_time = time()
+            self._drain_deadline = current_time + DRAIN_TIMEOUT
+            if self._deadline is not None and self._deadline > current_time:
+                self._drain_deadline = min(self._drain_deadline, self._deadline)
+        if not flush(self):
+            if self._drain_deadline > time():
+                if self._timer is None:
+                    self._schedule_timer()
+                return False
+            self._abandon_output()
+        self._drain_deadline = None
+        self._cancel_timer()
+        return True
+
     def wait(self, timeout=None):
         returned_results = wait_for_many_results([self], timeout=timeout)
         returned = self in returned_results
         if not returned and (self.get_deadline() or timeout):
+            self._report_timeout()
+            self._wait_for_kill()
+            raise CommandTimeout(self)
+        if self._timed_out:
+            # the deadline passed during the wait, and the kill policy ended the process
             raise CommandTimeout(self)
         return returned
 
+    def _wait_for_kill(self):
+        if self._timed_out and self._kill_policy is not None:
+            # the kill policy was applied, we wait until the process is gone
+            wait_for_any_exit([self])
+
+    def has_timed_out(self):
+        """ returns True once the deadline of the process passed while it was running """
+        return self._timed_out
+
+    def _report_timeout(self):
+        """ called when a wait timed out, or by the timer of the deadline. once the deadline passed,
+        the kill policy is applied """
+        if not self._timeout_reported:
+            self._timeout_reported = True
+            if events.listeners:
+                events.emit("timed_out", self)
+        if self._timed_out or self._deadline is None or self._deadline > time():
+            return
+        self._timed_out = True
+        if self._kill_policy is None or not self._is_running():
+            return
+        self._send_signal(self._kill_policy.first_signal)
+        self._kill_time = time() + self._kill_policy.grace_period
+        self._schedule_timer()
+
+    def __await__(self):
+        from .aio import completed
+        return completed(self).__await__()
+
     def is_finished(self):
         return self.poll() is not None
 
+    def _is_running(self):
+        """ with new_session, the children of the process may outlive it and hold the output pipes,
+        so the group is considered running until the pipes are closed """
+        if not self.has_exited():
+            return True
+        return self._new_session and bool(self.get_output_pipes())
+
+    def has_exited(self):
+        """ returns True once the process exited, unlike is_finished it doesn't flush or check the return code """
+        return self._reap() is not None
+
     def __repr__(self):
         return "<pid %s: %s>" % (self.get_pid(), self._command)
 
     def get_pid(self):
         return self._popen.pid
 
+    def iter_stdout(self, lines=False):
+        """ yields the output as it arrives (in chunks, or in lines when lines=True) until the pipe is closed.
+        this drives the ioloop of the current thread, and raises CommandTimeout when the deadline passes """
+        return self._iter_output(lambda: self._popen.stdout, self._stdout_callbacks, lines)
+
+    def iter_stderr(self, lines=False):
+        return self._iter_output(lambda: self._popen.stderr, self._stderr_callbacks, lines)
+
+    def _iter_output(self, get_pipe, callbacks, lines):
+        chunks = deque()
+        callback = LineSplitter(chunks.append) if lines else chunks.append
+        callbacks.append(callback)
+        try:
+            while True:
+                while chunks:
+                    chunk = chunks.popleft()
+                    if not chunk:
+                        return
+                    yield chunk
+                if get_pipe() is None:
+                    return
+                if not wait_for_activity(self):
+                    self._report_timeout()
+                    raise CommandTimeout(self)
+        finally:
+            callbacks.remove(callback)
+
     def get_stdout(self):
         return self._output.getvalue()
 
     def get_stderr(self):
         return self._error.getvalue()
+
+    def get_stdout_view(self):
+        """ returns a read-only memoryview of the output, without copying it where the capture policy allows """
+        getbuffer = getattr(self._output, "getbuffer", None)
+        return getbuffer() if getbuffer is not None else memoryview(self.get_stdout())
+
+    def get_stderr_view(self):
+        getbuffer = getattr(self._error, "getbuffer", None)
+        return getbuffer() if getbuffer is not None else memoryview(self.get_stderr())
+
+    def get_elapsed_time(self):
+        """ returns the time since the process was spawned """
+        return time() - self._start_time
+
+    def get_stats(self):
+        """ returns the ExecutionStats of the command (see infi.execute.stats) """
+        user_time = system_time = max_rss = None
+        if self._rusage is not None:
+            user_time, system_time = self._rusage.ru_utime, self._rusage.ru_stime
+            max_rss = get_max_rss(self._rusage)
+        wall_time = None if self._exit_time is None else self._exit_time - self._start_time
+        return ExecutionStats(self._spawn_time, wall_time, user_time, system_time, max_rss,
+                              self._input.get_written(), self._output.get_size(), self._error.get_size())
+
+    def get_stdout_capture(self):
+        """ returns the object retaining the output, for its size, dropped bytes or spill file """
+        return self._output
+
+    def get_stderr_capture(self):
+        return self._error
@@ -1,26 +1,67 @@
+import os
+try:
+    from gevent.subprocess import Popen, PIPE, STDOUT
+except ImportError:
+    from subprocess import Popen, PIPE, STDOUT
 try:
-    from gevent.subprocess import Popen, PIPE
+    from subprocess import DEVNULL
 except ImportError:
-    from subprocess import Popen, PIPE
+    # python 2
+    DEVNULL = open(os.devnull, "r+b")
 
 from .utils import quote, BUFSIZE
 from .result import Result
-import os
+from .pipeline import PipelineResult
+from .batch import execute_batch
+from .waiting import wait_for_any_exit
+from .ioloop import time
+from . import events
+from .pool import ExecutionPool, DEFAULT_MAX_PARALLEL
+from .spawn import POPEN, POSIX_SPAWN, FORKSERVER, ForkServer, ForkServerError, posix_spawn, get_args
+from collections import deque
+import atexit
+import shutil
+import tempfile
+
+SSH_COMMAND = "/usr/bin/ssh"
+
+def _get_session_kwargs(new_session):
+    # the argument is passed only when it's needed, so popen implementations that don't know it keep working
+    return dict(start_new_session=True) if new_session else dict()
+
 
 class Runner(object):
     def popen(self, *args, **kwargs):
         raise NotImplementedError()
 
     def execute_async(self, command, shell=False, assert_success=False, stdin=None, timeout=None, env=None,
-                      close_fds=None, cwd=None):
+                      close_fds=None, cwd=None, stdout_callback=None, stderr_callback=None, capture_output=True,
+                      capture=None, stdout=PIPE, stderr=PIPE, kill_policy=None, new_session=False):
+        """ stdout and stderr are captured by default, they can be redirected to DEVNULL, a file object or
+        a file descriptor instead (and stderr to STDOUT), so the output never passes through the interpreter.
+        with a kill_policy (see KillPolicy), the process is stopped when the timeout passes.
+        with new_session, the process is started in a session (and process group) of its own, and the signals
+        of kill and of the kill policy are sent to the whole group, including the children of a shell """
         if close_fds is None:
             close_fds = False if os.name == 'nt' else True
-        popen = self.popen(command, shell=shell, stderr=PIPE, stdout=PIPE, stdin=PIPE, env=env, close_fds=close_fds,
-                           bufsize=BUFSIZE, cwd=cwd)
-        return Result(command, popen,
+        spawn_start = time()
+        popen = self.popen(command, shell=shell, stderr=stderr, stdout=stdout, stdin=PIPE, env=env,
+                           close_fds=close_fds, bufsize=BUFSIZE, cwd=cwd, **_get_session_kwargs(new_session))
+        spawn_time = time() - spawn_start
+        result = Result(command, popen,
                       stdin=stdin,
                       assert_success=assert_success,
-                      timeout=timeout)
+                      timeout=timeout,
+                      stdout_callback=stdout_callback,
+                      stderr_callback=stderr_callback,
+                      capture_output=capture_output,
+                      capture=capture,
+                      spawn_time=spawn_time,
+                      kill_policy=kill_policy,
+                      new_session=new_session)
+        if events.listeners:
+            events.emit("spawned", result)
+        return result
 
     def execute(self, *args, **kwargs):
         returned = self.execute_async(*args, **kwargs)
@@ -30,33 +71,236 @@ class Runner(object):
     def execute_assert_success(self, *args, **kwargs):
         kwargs.update(assert_success=True)
         return self.execute(*args, **kwargs)
+
+    def pipeline_async(self, commands, shell=False, assert_success=False, stdin=None, timeout=None, env=None,
+                       close_fds=None, cwd=None, stdout_callback=None, stderr_callback=None, capture_output=True,
+                       capture=None, stdout=PIPE, stderr=PIPE, pipefail=False, kill_policy=None,
+                       new_session=False):
+        """ runs the commands as a pipeline (like "a | b | c" in the shell), the stages are connected with
+        kernel pipes. stdin is fed to the first stage, and the output of the last stage is captured (or redirected)
+        like in execute_async. the stderr of every stage is captured separately.
+        with new_session, every stage gets a session of its own """
+        if close_fds is None:
+            close_fds = False if os.name == 'nt' else True
+        results = []
+        upstream = PIPE
+        for index, command in enumerate(commands):
+            last = index == len(commands) - 1
+            spawn_start = time()
+            try:
+                popen = self.popen(command, shell=shell, stderr=stderr, stdout=stdout if last else PIPE,
+                                   stdin=upstream, env=env, close_fds=close_fds, bufsize=BUFSIZE, cwd=cwd,
+                                   **_get_session_kwargs(new_session))
+            except Exception:
+                if upstream is not PIPE:
+                    upstream.close()
+                for result in results:
+                    result.kill()
+                raise
+            if upstream is not PIPE:
+                # the next stage holds the read end now, so the previous stage gets SIGPIPE if it exits early
+                upstream.close()
+            if not last:
+                upstream, popen.stdout = popen.stdout, None
+            results.append(Result(command, popen,
+                                  stdin=stdin if index == 0 else None,
+                                  assert_success=False,
+                                  timeout=timeout,
+                                  stdout_callback=stdout_callback if last else None,
+                                  stderr_callback=stderr_callback,
+                                  capture_output=capture_output,
+                                  capture=capture,
+                                  spawn_time=time() - spawn_start,
+                                  kill_policy=kill_policy,
+                                  new_session=new_session))
+            if events.listeners:
+                events.emit("spawned", results[-1])
+        return PipelineResult(results, assert_success, pipefail)
+
+    def pipeline(self, *args, **kwargs):
+        returned = self.pipeline_async(*args, **kwargs)
+        returned.wait()
+        return returned
+
+    def pipeline_assert_success(self, *args, **kwargs):
+        kwargs.update(assert_success=True)
+        return self.pipeline(*args, **kwargs)
+
+    def execute_many(self, commands, max_parallel=DEFAULT_MAX_PARALLEL, **kwargs):
+        """ runs the commands (an iterable, consumed lazily) with at most max_parallel of them running at once,
+        and yields the results as they finish. the rest of the arguments are passed to execute_async """
+        pool = ExecutionPool(max_parallel)
+        return pool.as_completed((self, (command,), kwargs) for command in commands)
+
+    def execute_batch(self, commands, **kwargs):
+        """ runs the commands one after the other in a single shell session, and returns their results
+        (see infi.execute.batch). through SSH, the whole batch costs one session """
+        return execute_batch(self, commands, **kwargs)
+
+    def map(self, commands, max_parallel=DEFAULT_MAX_PARALLEL, **kwargs):
+        """ like execute_many, but yields the results in the order of the commands """
+        started = deque()
+        finished = set()
+        pool = ExecutionPool(max_parallel, start_callback=started.append)
+        for result in pool.as_completed((self, (command,), kwargs) for command in commands):
+            finished.add(result)
+            while started and started[0] in finished:
+                finished.discard(started[0])
+                yield started.popleft()
+
+    def aexecute(self, *args, **kwargs):
+        """ asyncio flavor of execute, returns a coroutine """
+        from .aio import execute
+        return execute(self, *args, **kwargs)
+
+    def aexecute_assert_success(self, *args, **kwargs):
+        kwargs.update(assert_success=True)
+        return self.aexecute(*args, **kwargs)
+
+    def submit(self, *args, **kwargs):
+        """ like execute_async, but returns a concurrent.futures.Future of the result, which is waited for by the
+        reactor thread (see infi.execute.reactor) """
+        from .reactor import submit
+        return submit(self.execute_async(*args, **kwargs))
+
 class LocalRunner(Runner):
+    def __init__(self, spawn=POPEN):
+        """ spawn selects how the processes are started (see infi.execute.spawn): POPEN (subprocess.Popen),
+        POSIX_SPAWN or FORKSERVER (the fork server is started right away, so create the runner early, and if it
+        fails to start, Popen is used). commands that use Popen arguments the backend doesn't support are
+        started with Popen """
+        super(LocalRunner, self).__init__()
+        self._spawn = spawn if os.name != 'nt' else POPEN
+        self._fork_server = None
+        if self._spawn == FORKSERVER:
+            self._fork_server = ForkServer()
+            try:
+                self._fork_server.start()
+            except ForkServerError:
+                self._spawn, self._fork_server = POPEN, None
+
     def popen(self, *args, **kwargs):
-        return Popen(*args, **kwargs)
+        if self._spawn == POPEN or not self._can_spawn(*args, **kwargs):
+            return Popen(*args, **kwargs)
+        return self._spawn_process(*args, **kwargs)
+
+    def _can_spawn(self, command, close_fds=True, cwd=None, **kwargs):
+        # posix_spawn can't change the working directory, and we don't pass other descriptors to the child
+        if not set(kwargs).issubset(("shell", "stdin", "stdout", "stderr", "env", "bufsize", "start_new_session")):
+            return False
+        return close_fds and (cwd is None or self._spawn == FORKSERVER)
+
+    def _spawn_process(self, command, shell=False, stdin=None, stdout=None, stderr=None, env=None, close_fds=True,
+                       bufsize=-1, cwd=None, start_new_session=False):
+        args = get_args(command, shell)
+        if self._spawn == POSIX_SPAWN:
+            return posix_spawn(args, env=env, stdin=stdin, stdout=stdout, stderr=stderr, bufsize=bufsize,
+                               start_new_session=start_new_session)
+        return self._fork_server.spawn(args, env=env, cwd=cwd, stdin=stdin, stdout=stdout, stderr=stderr,
+                                       bufsize=bufsize, start_new_session=start_new_session)
+
+    def close(self):
+        """ stops the fork server """
+        if self._fork_server is not None:
+            self._fork_server.close()
 
 local = LocalRunner()
 
 class SSHRunner(Runner):
-    def __init__(self, host, base_runner=None):
+    def __init__(self, host, base_runner=None, multiplex=False, control_persist=60, control_dir=None,
+                 max_sessions=None, ssh_command=SSH_COMMAND, connect_timeout=None):
+        """ with multiplex=True the commands share a master connection to the host (ssh's ControlMaster),
+        so only the first command pays for the handshake. the master stays up control_persist seconds after
+        the last command, or until close() is called. the control socket is kept in control_dir, or in a
+        temporary directory that is removed on close.
+        max_sessions caps the number of commands started with execute_async that run concurrently,
+        execute_async waits (and reads the output of the running commands) until there's room.
+        connect_timeout (in whole seconds) is passed to ssh's ConnectTimeout, so unreachable hosts fail fast """
         super(SSHRunner, self).__init__()
         if base_runner is None:
             base_runner = local
         self.host = host
         self._base_runner = base_runner
+        self._ssh_command = ssh_command
+        self._multiplex = multiplex
+        self._control_persist = control_persist
+        self._control_dir = control_dir
+        self._owns_control_dir = False
+        self._max_sessions = max_sessions
+        self._connect_timeout = connect_timeout
+        self._sessions = []
 
     def popen(self, cmd, *args, **kwargs):
         cmd = self._fix_cmd(cmd)
         kwargs['shell'] = True
         return self._base_runner.popen(cmd, *args, **kwargs)
 
+    def execute_async(self, *args, **kwargs):
+        if self._max_sessions is not None:
+            self._wait_for_session_slot()
+        result = super(SSHRunner, self).execute_async(*args, **kwargs)
+        if self._max_sessions is not None:
+            self._sessions.append(result)
+        return result
+
+    def _wait_for_session_slot(self):
+        while True:
+            self._sessions = [result for result in self._sessions if not result.has_exited()]
+            if len(self._sessions) < self._max_sessions:
+                return
+            wait_for_any_exit(self._sessions)
+
     def _fix_cmd(self, cmd):
+        # the command line runs through the shell (see popen), so the ssh command and its options are a string
         if isinstance(cmd, list) or isinstance(cmd, tuple):
-            cmd = [self._get_ssh_command(), self.host] + [" ".join(map(quote, cmd))]
-        else:
-            cmd = "{0} {1} {2}".format(self._get_ssh_command(), self.host, quote(cmd))
-        return cmd
+            cmd = " ".join(map(quote, cmd))
+        return "{0} {1} {2}".format(self._get_ssh_command(), self.host, quote(cmd))
+
+    def _get_control_path(self):
+        if self._control_dir is None:
+            self._control_dir = tempfile.mkdtemp(prefix="infi-ssh-")
+            self._owns_control_dir = True
+            atexit.register(shutil.rmtree, self._control_dir, True)
+        # unix sockets paths are limited to ~100 characters, so the path is kept short
+        return os.path.join(self._control_dir, "%r@%h:%p")
+
+    def _get_control_options(self):
+        return ["-o", "ControlPath={0}".format(self._get_control_path())]
+
+    def _get_ssh_options(self):
+        options = []
+        if self._connect_timeout is not None:
+            options += ["-o", "ConnectTimeout={0}".format(int(self._connect_timeout))]
+        if self._multiplex:
+            options += self._get_control_options() + ["-o", "ControlMaster=auto",
+                                                      "-o", "ControlPersist={0}".format(self._control_persist)]
+        return options
 
     def _get_ssh_command(self):
-        return "/usr/bin/ssh"
+        return " ".join([self._ssh_command] + [quote(option) for option in self._get_ssh_options()])
+
+    def is_master_running(self):
+        """ returns True if the master connection to the host is up """
+        if not self._multiplex or self._control_dir is None:
+            return False
+        command = [self._ssh_command] + self._get_control_options() + ["-O", "check", self.host]
+        return self._base_runner.execute(command).get_returncode() == 0
+
+    def close(self):
+        """ stops the master connection and removes the temporary control directory """
+        if not self._multiplex or self._control_dir is None:
+            return
+        command = [self._ssh_command] + self._get_control_options() + ["-O", "exit", self.host]
+        self._base_runner.execute(command)
+        if self._owns_control_dir:
+            shutil.rmtree(self._control_dir, True)
+            self._control_dir = None
+            self._owns_control_dir = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 through_ssh = SSHRunner
@@ -0,0 +1,359 @@
+""" alternative ways of starting processes for LocalRunner
+
+fork() (which subprocess.Popen uses, unless it can use vfork or posix_spawn) has to copy the page tables of the
+parent, so it becomes slower as the parent grows. two alternatives are provided:
+
+* posix_spawn: the child is started with os.posix_spawnp (vfork and exec in glibc), so the cost doesn't depend
+  on the size of the parent. the descriptors python creates are non-inheritable, so only the standard
+  descriptors are passed to the child, like with close_fds=True
+* a fork server: a small helper process, started once, starts the children and reports their exit codes.
+  the descriptors of the children are passed to it over a unix socket
+
+both return a SpawnedProcess, which has the subset of the Popen interface that Result uses
+"""
+import io
+import os
+import array
+import sys
+import errno
+import pickle
+import select
+import signal
+import socket
+import struct
+import subprocess
+import threading
+from .utils import waitstatus_to_returncode
+
+POPEN = "popen"
+POSIX_SPAWN = "posix_spawn"
+FORKSERVER = "forkserver"
+
+_STATUS = struct.Struct("i")
+MAX_MESSAGE_SIZE = 1024 * 1024
+# how long we wait for a new fork server to report that it's ready
+START_TIMEOUT = 30
+_READY = b"ready"
+_SERVER_COMMAND = "from infi.execute.spawn import serve; serve({0})"
+_DEFAULT_SIGNALS = tuple(getattr(signal, name) for name in ("SIGPIPE", "SIGXFSZ") if hasattr(signal, name))
+
+
+def get_args(command, shell=False):
+    """ returns the argument list that Popen would execute """
+    if isinstance(command, (str, bytes)):
+        command = [command]
+    if shell:
+        return ["/bin/sh", "-c"] + list(command)
+    return list(command)
+
+
+class SpawnedProcess(object):
+    """ a process started with posix_spawn or by the fork server """
+    def __init__(self, args, pid, stdin=None, stdout=None, stderr=None, status_fd=None):
+        """ the exit code of processes that are not our children is read from status_fd """
+        super(SpawnedProcess, self).__init__()
+        self.args = args
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self._status_fd = status_fd
+
+    def __del__(self):
+        self._close_status_fd()
+
+    def _close_status_fd(self):
+        status_fd, self._status_fd = getattr(self, "_status_fd", None), None
+        if status_fd is not None:
+            os.close(status_fd)
+
+    def open_exit_fd(self):
+        """ returns a descriptor that becomes readable when the exit code is known, or None to use a pidfd """
+        if self._status_fd is None:
+            return None
+        return os.dup(self._status_fd)
+
+    def _read_status(self):
+        try:
+            data = os.read(self._status_fd, _STATUS.size)
+        except OSError as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        # an empty read means the fork server is gone, and the exit code is lost
+        self.returncode = _STATUS.unpack(data)[0] if data else -1
+        self._close_status_fd()
+
+    def poll(self):
+        if self.returncode is not None:
+            return self.returncode
+        if self._status_fd is not None:
+            self._read_status()
+            return self.returncode
+        try:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+        except OSError as error:
+            if error.errno != errno.ECHILD:
+                raise
+            # someone else reaped the child, like Popen we can't tell how it exited
+            self.returncode = 0
+            return self.returncode
+        if pid == self.pid:
+            self.returncode = waitstatus_to_returncode(status)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None and self._status_fd is None:
+            if timeout is None:
+                _, status = os.waitpid(self.pid, 0)
+                self.returncode = waitstatus_to_returncode(status)
+                return self.returncode
+        while self.poll() is None:
+            if self._status_fd is not None:
+                readable, _, _ = select.select([self._status_fd], [], [], timeout)
+            else:
+                readable = []
+                select.select([], [], [], 0.01)
+            if not readable and timeout is not None and self.poll() is None:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def kill(self):
+        os.kill(self.pid, signal.SIGKILL)
+
+    def terminate(self):
+        os.kill(self.pid, signal.SIGTERM)
+
+
+class _Stdio(object):
+    """ the descriptors of the standard streams of a new process, in the child and in the parent """
+    def __init__(self, stdin, stdout, stderr):
+        super(_Stdio, self).__init__()
+        self.child_fds = []
+        self.parent_fds = []
+        self._to_close = []
+        for target, value in enumerate((stdin, stdout, stderr)):
+            self._add(target, value)
+
+    def _add(self, target, value):
+        parent_fd = None
+        if value is None:
+            child_fd = target
+        elif value == subprocess.PIPE:
+            read_fd, write_fd = os.pipe()
+            child_fd, parent_fd = (read_fd, write_fd) if target == 0 else (write_fd, read_fd)
+            self._to_close.append(child_fd)
+        elif value == getattr(subprocess, "DEVNULL", None):
+            child_fd = os.open(os.devnull, os.O_RDWR)
+            self._to_close.append(child_fd)
+        elif value == subprocess.STDOUT:
+            child_fd = self.child_fds[1]
+        elif isinstance(value, int):
+            child_fd = value
+        else:
+            child_fd = value.fileno()
+        self.child_fds.append(child_fd)
+        self.parent_fds.append(parent_fd)
+
+    def close_child_fds(self):
+        for fd in self._to_close:
+            os.close(fd)
+        self._to_close = []
+
+    def close_parent_fds(self):
+        for fd in self.parent_fds:
+            if fd is not None:
+                os.close(fd)
+
+    def get_parent_files(self, bufsize=-1):
+        modes = ("wb", "rb", "rb")
+        return [None if fd is None else io.open(fd, mode, bufsize) for fd, mode in zip(self.parent_fds, modes)]
+
+
+def posix_spawn(args, env=None, stdin=None, stdout=None, stderr=None, bufsize=-1, start_new_session=False):
+    """ starts the process with os.posix_spawnp, the arguments are like Popen's """
+    stdio = _Stdio(stdin, stdout, stderr)
+    file_actions = [(os.POSIX_SPAWN_DUP2, fd, target) for target, fd in enumerate(stdio.child_fds) if fd != target]
+    try:
+        pid = os.posix_spawnp(args[0], args, os.environ if env is None else env,
+                              file_actions=file_actions, setsigdef=_DEFAULT_SIGNALS, setsid=start_new_session)
+    except BaseException:
+        stdio.close_parent_fds()
+        raise
+    finally:
+        stdio.close_child_fds()
+    return SpawnedProcess(args, pid, *stdio.get_parent_files(bufsize))
+
+
+def send_fds(sock, data, fds):
+    """ like socket.send_fds (python 3.9+), sends the descriptors with SCM_RIGHTS """
+    return sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))])
+
+
+def recv_fds(sock, bufsize, maxfds):
+    """ like socket.recv_fds (python 3.9+), returns the data and the list of descriptors """
+    fds = array.array("i")
+    data, ancdata, _, _ = sock.recvmsg(bufsize, socket.CMSG_LEN(maxfds * fds.itemsize))
+    for level, kind, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+    return data, list(fds)
+
+
+class ForkServerError(OSError):
+    """ the fork server failed to start """
+    pass
+
+
+class ForkServer(object):
+    def __init__(self):
+        super(ForkServer, self).__init__()
+        self._lock = threading.Lock()
+        self._socket = None
+        self._process = None
+
+    def start(self):
+        """ starts the server process, this should happen while the parent is small (the server is a new
+        interpreter either way, but starting it forks the parent once) """
+        with self._lock:
+            if self._process is not None:
+                if self._process.poll() is None:
+                    return
+                # the server is gone (killed, or crashed), the exit codes of its children are lost
+                self._socket.close()
+                self._socket = self._process = None
+            parent_socket, child_socket = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            command = _SERVER_COMMAND.format(child_socket.fileno())
+            # the server gets our sys.path, which may be set up at runtime (like in the scripts buildout generates)
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+            # in its own session, so ^C in the terminal doesn't stop it
+            process = subprocess.Popen([sys.executable, "-c", command], pass_fds=[child_socket.fileno()],
+                                       start_new_session=True, env=env)
+            child_socket.close()
+            try:
+                _wait_until_ready(parent_socket, process)
+            except BaseException:
+                parent_socket.close()
+                raise
+            self._socket, self._process = parent_socket, process
+
+    def close(self):
+        with self._lock:
+            if self._process is None:
+                return
+            self._socket.close()
+            self._process.wait()
+            self._socket = self._process = None
+
+    def spawn(self, args, env=None, cwd=None, stdin=None, stdout=None, stderr=None, bufsize=-1,
+              start_new_session=False):
+        """ starts the process in the server, the arguments are like Popen's """
+        self.start()
+        request = pickle.dumps((args, dict(os.environ) if env is None else env, cwd, start_new_session))
+        stdio = _Stdio(stdin, stdout, stderr)
+        status_fd, status_write_fd = os.pipe()
+        try:
+            with self._lock:
+                send_fds(self._socket, request, stdio.child_fds + [status_write_fd])
+                reply = self._socket.recv(MAX_MESSAGE_SIZE)
+            if not reply:
+                raise OSError(errno.EPIPE, "the fork server is gone")
+            pid, error = pickle.loads(reply)
+            if error is not None:
+                raise error
+        except BaseException:
+            stdio.close_parent_fds()
+            os.close(status_fd)
+            raise
+        finally:
+            stdio.close_child_fds()
+            os.close(status_write_fd)
+        os.set_blocking(status_fd, False)
+        return SpawnedProcess(args, pid, *stdio.get_parent_files(bufsize), status_fd=status_fd)
+
+
+def _wait_until_ready(parent_socket, process):
+    parent_socket.settimeout(START_TIMEOUT)
+    try:
+        ready = parent_socket.recv(len(_READY))
+    except socket.timeout:
+        ready = None
+    finally:
+        parent_socket.settimeout(None)
+    if ready == _READY:
+        return
+    if process.poll() is None:
+        process.kill()
+    raise ForkServerError("the fork server failed to start (exit code {0}), its errors are written to our stderr"
+                          .format(process.wait()))
+
+
+def _spawn_child(request, fds, children):
+    args, env, cwd, start_new_session = pickle.loads(request)
+    try:
+        # Popen uses vfork where it can, which is cheap in the small server anyway
+        process = subprocess.Popen(args, stdin=fds[0], stdout=fds[1], stderr=fds[2], env=env, cwd=cwd,
+                                   close_fds=True, start_new_session=start_new_session)
+    except Exception as error:
+        # like with Popen, the error (e.g. OSError, or TypeError for bad arguments) is raised in the caller
+        os.close(fds[3])
+        return None, error
+    finally:
+        for fd in fds[:3]:
+            os.close(fd)
+    # the Popen object is kept until we reap the child, otherwise subprocess might reap it
+    children[process.pid] = (process, fds[3])
+    return process.pid, None
+
+
+def _get_reply(reply):
+    """ errors that can't be pickled are sent as a RuntimeError """
+    try:
+        return pickle.dumps(reply)
+    except Exception:
+        pid, error = reply
+        return pickle.dumps((pid, RuntimeError(repr(error))))
+
+
+def _reap_children(children):
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        if pid not in children:
+            continue
+        process, status_fd = children.pop(pid)
+        process.returncode = waitstatus_to_returncode(status)
+        os.write(status_fd, _STATUS.pack(process.returncode))
+        os.close(status_fd)
+
+
+def serve(fd):
+    """ the main loop of the fork server, it exits when the parent closes the socket """
+    server_socket = socket.socket(fileno=fd)
+    wakeup_read_fd, wakeup_write_fd = os.pipe()
+    os.set_blocking(wakeup_read_fd, False)
+    os.set_blocking(wakeup_write_fd, False)
+    signal.set_wakeup_fd(wakeup_write_fd)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    children = {}
+    server_socket.send(_READY)
+    while True:
+        readable, _, _ = select.select([server_socket, wakeup_read_fd], [], [])
+        if wakeup_read_fd in readable:
+            while True:
+                try:
+                    if not os.read(wakeup_read_fd, 512):
+                        break
+                except BlockingIOError:
+                    break
+            _reap_children(children)
+        if server_socket in readable:
+            request, fds = recv_fds(server_socket, MAX_MESSAGE_SIZE, 4)
+            if not request:
+                return
+            server_socket.send(_get_reply(_spawn_child(request, fds, children)))
@@ -0,0 +1,64 @@
+""" resource accounting of the commands (see Result.get_stats) and summaries of batches of them """
+import sys
+from collections import namedtuple
+
+ExecutionStats = namedtuple("ExecutionStats", ["spawn_time", "wall_time", "user_time", "system_time", "max_rss",
+                                               "stdin_bytes", "stdout_bytes", "stderr_bytes"])
+ExecutionStats.__doc__ = """ times are in seconds and max_rss is in bytes. wall_time is None until the process
+exits, and the rusage fields are None when it wasn't reaped by us (with gevent, or by the fork server) """
+
+# ru_maxrss is in kilobytes, except on macOS
+_MAX_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def get_max_rss(rusage):
+    return rusage.ru_maxrss * _MAX_RSS_UNIT
+
+
+def _sum(values):
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+
+class BatchSummary(object):
+    """ aggregated stats of many results """
+    def __init__(self, results):
+        super(BatchSummary, self).__init__()
+        self._stats = [(result, result.get_stats()) for result in results]
+        self.count = len(self._stats)
+        self.failed = sum(1 for result, _ in self._stats if result.get_returncode() not in (None, 0))
+        wall_times = [stats.wall_time for _, stats in self._stats if stats.wall_time is not None]
+        self.total_wall_time = sum(wall_times)
+        self.max_wall_time = max(wall_times) if wall_times else None
+        self.mean_wall_time = self.total_wall_time / len(wall_times) if wall_times else None
+        self.total_spawn_time = _sum(stats.spawn_time for _, stats in self._stats)
+        self.total_user_time = _sum(stats.user_time for _, stats in self._stats)
+        self.total_system_time = _sum(stats.system_time for _, stats in self._stats)
+        max_rss = [stats.max_rss for _, stats in self._stats if stats.max_rss is not None]
+        self.max_rss = max(max_rss) if max_rss else None
+        self.stdin_bytes = sum(stats.stdin_bytes for _, stats in self._stats)
+        self.stdout_bytes = sum(stats.stdout_bytes for _, stats in self._stats)
+        self.stderr_bytes = sum(stats.stderr_bytes for _, stats in self._stats)
+
+    def get_top(self, key, count=10):
+        """ returns the (result, stats) pairs with the highest values of key, which is a field of
+        ExecutionStats or "cpu_time" (user and system) """
+        def get_value(item):
+            stats = item[1]
+            if key == "cpu_time":
+                value = _sum([stats.user_time, stats.system_time])
+            else:
+                value = getattr(stats, key)
+            return -1 if value is None else value
+        return sorted(self._stats, key=get_value, reverse=True)[:count]
+
+    def __repr__(self):
+        return ("<BatchSummary: {0} commands, {1} failed, wall {2:.3f}s (max {3}), "
+                "cpu {4}s user / {5}s system>").format(self.count, self.failed, self.total_wall_time,
+                                                       self.max_wall_time, self.total_user_time,
+                                                       self.total_system_time)
+
+
+def summarize(results):
+    """ returns a BatchSummary of the results """
+    return BatchSummary(results)
@@ -1,6 +1,12 @@
 import os
+import sys
 import time
 import errno
+# the backend is resolved once, the reads and writes are on the hot path
+try:
+    from gevent.os import nb_read, nb_write
+except ImportError:
+    nb_read = nb_write = None
 
 
 INVALID_HANDLE_VALUE = -1
@@ -48,6 +54,12 @@ def is_blocking(fd):
     else:
         return _is_blocking_windows(fd)
 
+def waitstatus_to_returncode(status):
+    """ converts a status from os.waitpid to a returncode like Popen's (negative for signals) """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
 def quote(s):
     s = s.replace("\\", "\\\\").replace('"', '\\"')
     if " " in s:
@@ -67,17 +79,53 @@ def retry_loop_on_eagain(func, *args, **kwargs):
                 raise
 
 def non_blocking_read(file_obj, count):
-    try:
-        from gevent.os import nb_read
+    if nb_read is not None:
         return nb_read(file_obj.fileno(), count if count >= 0 else BUFSIZE)
+    return retry_loop_on_eagain(file_obj.read, count)
+
+def _readinto(fd, view):
+    if hasattr(os, "readv"):
+        return os.readv(fd, [view])
+    data = os.read(fd, len(view))
+    view[:len(data)] = data
+    return len(data)
+
+def non_blocking_readinto(file_obj, view, retry=True):
+    """ reads straight into a writable buffer (bytearray/memoryview) without allocating a bytes object,
+    returns the number of bytes read, 0 on EOF.
+    with retry=False, returns None instead of waiting when there's nothing to read """
+    if not retry:
+        try:
+            return _readinto(file_obj.fileno(), view)
+        except IOError as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return None
+            raise
+    if nb_read is None:
+        return retry_loop_on_eagain(_readinto, file_obj.fileno(), view)
+    data = nb_read(file_obj.fileno(), len(view))
+    view[:len(data)] = data
+    return len(data)
+
+def set_pipe_size(fd, size):
+    """ raises the capacity of a pipe (Linux only), returns the new capacity or None if it can't be changed """
+    try:
+        import fcntl
     except ImportError:
-        return retry_loop_on_eagain(file_obj.read, count)
+        return None
+    # the constants were added to fcntl in Python 3.10
+    F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return fcntl.fcntl(fd, F_SETPIPE_SZ, size)
+    except (IOError, OSError):
+        # EPERM above /proc/sys/fs/pipe-max-size or the per-user limit
+        return None
 
 def non_blocking_write(file_obj, input_buffer):
     if not input_buffer:
         return
-    try:
-        from gevent.os import nb_write
-        nb_write(file_obj.fileno(), input_buffer)
-    except ImportError:
-        return retry_loop_on_eagain(file_obj.write, input_buffer)
+    if nb_write is not None:
+        return nb_write(file_obj.fileno(), input_buffer)
+    return retry_loop_on_eagain(file_obj.write, input_buffer)
@@ -1,30 +1,109 @@
 from .ioloop import IOLoop, time
+from .child_exit import sigchld_wakeup, drain_fd
+try:
+    from gevent.local import local
+except ImportError:
+    from threading import local
 
 DEFAULT_SAMPLE_INTERVAL = 0.05
+# the SIGCHLD handler may be replaced while we wait, so with SIGCHLD wakeups we still sample, but rarely
+SIGCHLD_SAMPLE_INTERVAL = 1.0
+ALL_COMPLETED = "ALL_COMPLETED"
+FIRST_COMPLETED = "FIRST_COMPLETED"
+
+_local = local()
+
+def get_ioloop():
+    """ returns the IOLoop of the current thread (or greenlet, with gevent).
+    the loop is long-lived: results stay registered in it until their pipes are exhausted """
+    ioloop = getattr(_local, "ioloop", None)
+    if ioloop is None:
+        ioloop = _local.ioloop = IOLoop()
+    return ioloop
 
 def wait_for_many_results(results, **kwargs):
-    ioloop = IOLoop()
+    """ waits until all of the results finished (or with return_when=FIRST_COMPLETED, until any of them finished),
+    or until the timeout or the earliest deadline of the results passes (with use_deadlines=False, only the timeout).
+    returns a list with the finished results, and None in place of the others """
+    ioloop = get_ioloop()
     results = dict((result, None) for result in results)
     for result in results.keys():
         result.register_to_ioloop(ioloop)
     timeout = kwargs.pop('timeout', None)
-    deadline = _get_deadline(results.keys(), timeout)
+    return_when = kwargs.pop('return_when', ALL_COMPLETED)
+    use_deadlines = kwargs.pop('use_deadlines', True)
+    deadline = _get_deadline(results.keys() if use_deadlines else (), timeout)
+    # when the ioloop wakes up on process exit (pidfd or SIGCHLD), there's no need to sample the processes often
+    sample_interval = None
+    wakeup_fd = None
+    if not all(result.has_exit_notification() for result in results.keys()):
+        wakeup_fd = sigchld_wakeup.subscribe()
+        if wakeup_fd is None:
+            sample_interval = DEFAULT_SAMPLE_INTERVAL
+        else:
+            sample_interval = SIGCHLD_SAMPLE_INTERVAL
+            ioloop.register_read(wakeup_fd, _handle_wakeup)
 
-    # Note that the _should_still_wait predicate might return False if
-    # things happen real quickly
-    while True:
-        current_time = time()
-        ioloop.do_iteration(_get_wait_interval(current_time, deadline))
-        _sweep_finished_results(results, ioloop)
-        if not _should_still_wait(results, deadline=deadline):
-            break
-    _sweep_finished_results(results, ioloop)
+    try:
+        # processes that exited before we started waiting (or subscribed to SIGCHLD) won't wake us up
+        _sweep_finished_results(results)
+        # Note that the _should_still_wait predicate might return False if
+        # things happen real quickly. we iterate at least once (unless we're done), so the events that are already
+        # pending, like the pidfd of a process that exited, are handled even if the deadline passed
+        while _should_still_wait(results, deadline=None, return_when=return_when):
+            current_time = time()
+            ioloop.do_iteration(_get_wait_interval(current_time, deadline, sample_interval))
+            _sweep_finished_results(results)
+            if not _should_still_wait(results, deadline=deadline, return_when=return_when):
+                break
+    finally:
+        if wakeup_fd is not None:
+            ioloop.unregister_read(wakeup_fd)
+            sigchld_wakeup.unsubscribe(wakeup_fd)
     return list(results.values())
 
-def flush(result):
-    ioloop = IOLoop()
+def wait_for_activity(result):
+    """ runs a single iteration of the current thread's ioloop for the result,
+    returns False if the result's deadline passed """
+    ioloop = get_ioloop()
     result.register_to_ioloop(ioloop)
-    ioloop.flush()
+    deadline = result.get_deadline()
+    current_time = time()
+    if deadline is not None and deadline <= current_time:
+        return False
+    sample_interval = None if result.has_exit_notification() else DEFAULT_SAMPLE_INTERVAL
+    ioloop.do_iteration(_get_wait_interval(current_time, deadline, sample_interval))
+    if result.is_exit_signaled():
+        # flushes the pipes if the process exited
+        result.poll()
+    return True
+
+def wait_for_any_exit(results):
+    """ drives the current thread's ioloop until one of the processes exits, regardless of the deadlines
+    (the output is read meanwhile, so the processes don't block on full pipes).
+    returns the results whose processes exited, without checking their return codes """
+    ioloop = get_ioloop()
+    for result in results:
+        result.register_to_ioloop(ioloop)
+    while True:
+        exited = [result for result in results if result.has_exited()]
+        if exited or not results:
+            return exited
+        sample_interval = None if all(result.has_exit_notification() for result in results) else DEFAULT_SAMPLE_INTERVAL
+        ioloop.do_iteration(sample_interval)
+
+def flush(result):
+    """ reads the output of a finished result that is ready, returns False if the pipes are still open
+    (see IOLoop.flush) """
+    # the handlers are called directly, so we flush through whichever loop the result is registered to
+    ioloop = result.get_ioloop()
+    if ioloop is None:
+        ioloop = get_ioloop()
+        result.register_to_ioloop(ioloop)
+    return ioloop.flush(result.get_output_pipes())
+
+def _handle_wakeup(ioloop, f, count=-1):
+    drain_fd(f)
 
 def _get_deadline(results, timeout=None):
     """ returns the earliest deadline point in time """
@@ -36,24 +115,30 @@ def _get_deadline(results, timeout=None):
         all_deadlines.add(start_time + timeout)
     return min(all_deadlines) if all_deadlines else None
 
-def _get_wait_interval(current_time, deadline):
+def _get_wait_interval(current_time, deadline, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+    """ sample_interval is None when we don't need to poll the processes, because their exit wakes up the ioloop """
     if deadline is None:
-        return DEFAULT_SAMPLE_INTERVAL
-    return max(0, min(DEFAULT_SAMPLE_INTERVAL, (deadline - current_time)))
+        return sample_interval
+    if sample_interval is None:
+        return max(0, deadline - current_time)
+    return max(0, min(sample_interval, (deadline - current_time)))
 
-def _sweep_finished_results(results, ioloop):
+def _sweep_finished_results(results):
     for result in results.keys():
         if results[result] is not None:
             continue
-        # we unregister and re-register, because when is_finished returns True, the pipes are flushed and closed
-        result.unregister_from_ioloop(ioloop)
+        if not result.is_exit_signaled():
+            # we'll be woken up by the pidfd when the process exits
+            continue
+        # when is_finished returns True, the pipes are flushed and unregistered
         if result.is_finished():
             results[result] = result
-        result.register_to_ioloop(ioloop)
 
-def _should_still_wait(results, deadline):
+def _should_still_wait(results, deadline, return_when=ALL_COMPLETED):
     if all(r is not None for r in results.values()):
         return False
+    if return_when == FIRST_COMPLETED and any(r is not None for r in results.values()):
+        return False
     if deadline is not None and deadline < time():
         return False
     return True
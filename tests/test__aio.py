@@ -0,0 +1,96 @@
+import os
+import sys
+from time import time, sleep
+from .test_utils import TestCase, SkipTest
+from infi.execute import local, ExecutionError, CommandTimeout
+
+
+class AsyncioTest(TestCase):
+    def setUp(self):
+        super(AsyncioTest, self).setUp()
+        if os.name == 'nt' or sys.version_info < (3, 7):
+            raise SkipTest("available on posix systems with python 3.7+")
+        import asyncio
+        self.asyncio = asyncio
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        super(AsyncioTest, self).tearDown()
+
+    def _run(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+    def test__execute(self):
+        result = self._run(local.aexecute("echo hello", shell=True))
+        self.assertEqual(result.get_returncode(), 0)
+        self.assertEqual(result.get_stdout(), b"hello\n")
+
+    def test__stdin(self):
+        result = self._run(local.aexecute("cat", shell=True, stdin=b"hello" * 10000))
+        self.assertEqual(result.get_stdout(), b"hello" * 10000)
+
+    def test__await_result(self):
+        result = local.execute_async("echo hello", shell=True)
+        self.assertIs(self._run(result), result)
+        self.assertEqual(result.get_stdout(), b"hello\n")
+
+    def test__await_pipeline(self):
+        result = local.pipeline_async([["echo", "hello"], ["tr", "a-z", "A-Z"]])
+        self.assertIs(self._run(result), result)
+        self.assertEqual(result.get_stdout(), b"HELLO\n")
+
+    def test__assert_success(self):
+        with self.assertRaises(ExecutionError) as caught:
+            self._run(local.aexecute_assert_success("false", shell=True))
+        self.assertEqual(caught.exception.result.get_returncode(), 1)
+
+    def test__timeout(self):
+        start_time = time()
+        with self.assertRaises(CommandTimeout) as caught:
+            self._run(local.aexecute("sleep 100", shell=True, timeout=0.5))
+        self.assertLess(time() - start_time, 2)
+        self.assertFalse(caught.exception.result.is_finished())
+        caught.exception.result.kill()
+
+    def test__finished_before_the_deadline(self):
+        result = local.execute_async(["true"], timeout=0.2)
+        # the deadline passes before the event loop handled the exit of the process
+        sleep(0.5)
+        self.assertIs(self._run(result), result)
+        self.assertEqual(result.get_returncode(), 0)
+
+    def test__timed_out_with_kill_policy(self):
+        from infi.execute import KillPolicy
+        result = local.execute_async(["sleep", "100"], timeout=0.2, kill_policy=KillPolicy(grace_period=1))
+        with self.assertRaises(CommandTimeout):
+            self._run(result)
+
+    def test__many_concurrent_commands(self):
+        from infi.execute import aio
+        start_time = time()
+        results = [local.execute_async("sleep 1", shell=True) for _ in range(100)]
+        finished = self._run(aio.wait_for_many_results(results))
+        self.assertLess(time() - start_time, 5)
+        self.assertEqual(len(finished), 100)
+        self.assertEqual(set(result.get_returncode() for result in finished), set([0]))
+
+    def test__drain_doesnt_block_the_loop(self):
+        gaps = []
+        async def tick(done):
+            last = time()
+            while not done.is_set():
+                await self.asyncio.sleep(0.01)
+                gaps.append(time() - last)
+                last = time()
+        async def run():
+            done = self.asyncio.Event()
+            ticker = self.asyncio.ensure_future(tick(done))
+            # the background sleep holds the pipes for a second after the shell exits
+            result = await local.aexecute("echo hello; sleep 5 &", shell=True)
+            done.set()
+            await ticker
+            return result
+        result = self._run(run())
+        self.assertEqual(result.get_stdout(), b"hello\n")
+        self.assertLess(max(gaps), 0.5)
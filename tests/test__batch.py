@@ -0,0 +1,49 @@
+import os
+from .test_utils import TestCase, SkipTest
+from infi.execute import local, ExecutionError, CommandTimeout, KillPolicy
+from infi.execute.batch import FrameParser, MARKER
+
+
+class FrameParserTest(TestCase):
+    def test__frames_in_pieces(self):
+        data = (b"motd\n" + MARKER + b" 0 out 6\nhello\n" + MARKER + b" 0 err 0\n" + MARKER + b" 0 exit 3\n" +
+                MARKER + b" 1 out 3\n\n\n\n" + MARKER + b" 1 err 1\nx" + MARKER + b" 1 exit 0\n")
+        for size in (1, 7, len(data)):
+            parser = FrameParser(2)
+            for index in range(0, len(data), size):
+                parser(data[index:index + size])
+            self.assertEqual(parser.returncodes, [3, 0])
+            self.assertEqual(parser.outputs, [dict(out=b"hello\n", err=b""), dict(out=b"\n\n\n", err=b"x")])
+
+
+class ExecuteBatchTest(TestCase):
+    def setUp(self):
+        super(ExecuteBatchTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def test__results(self):
+        commands = ["echo out; echo err >&2; exit 2", ["echo", "it's a 'quoted' $arg"], "head -c 100000 /dev/zero",
+                    "cat"]
+        results = local.execute_batch(commands)
+        self.assertEqual([result.get_returncode() for result in results], [2, 0, 0, 0])
+        self.assertEqual(results[0].get_stdout(), b"out\n")
+        self.assertEqual(results[0].get_stderr(), b"err\n")
+        self.assertEqual(results[1].get_stdout(), b"it's a 'quoted' $arg\n")
+        self.assertEqual(results[2].get_stdout(), b"\0" * 100000)
+        # the commands don't read the script
+        self.assertEqual(results[3].get_stdout(), b"")
+        self.assertTrue(all(result.is_finished() for result in results))
+
+    def test__many_commands_in_one_session(self):
+        results = local.execute_batch(["echo $PPID"] * 200)
+        self.assertEqual(len(set(result.get_stdout() for result in results)), 1)
+
+    def test__assert_success(self):
+        with self.assertRaises(ExecutionError) as caught:
+            local.execute_batch(["true", "false", "exit 3"], assert_success=True)
+        self.assertEqual(caught.exception.result.get_returncode(), 1)
+
+    def test__timeout(self):
+        with self.assertRaises(CommandTimeout):
+            local.execute_batch(["sleep 100"], timeout=0.2, new_session=True, kill_policy=KillPolicy(grace_period=1))
@@ -0,0 +1,101 @@
+import os
+import threading
+from .test_utils import TestCase, SkipTest
+from infi.execute import local, CachingRunner, ExecutionError, CommandTimeout
+from infi.execute.ioloop import time
+
+# prints a different number every time it runs
+COUNTER = "echo $$"
+
+
+class CachingRunnerTest(TestCase):
+    def setUp(self):
+        super(CachingRunnerTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        self.runner = CachingRunner(local, ttl=60)
+
+    def test__cached(self):
+        first = self.runner.execute(COUNTER, shell=True, cacheable=True)
+        self.assertIs(self.runner.execute(COUNTER, shell=True, cacheable=True), first)
+        self.assertEqual((self.runner.hits, self.runner.misses), (1, 1))
+
+    def test__not_cacheable(self):
+        first = self.runner.execute(COUNTER, shell=True)
+        self.assertNotEqual(self.runner.execute(COUNTER, shell=True).get_stdout(), first.get_stdout())
+        chunks = []
+        self.runner.execute(COUNTER, shell=True, cacheable=True, stdout_callback=chunks.append)
+        self.runner.execute(COUNTER, shell=True, cacheable=True, stdout_callback=chunks.append)
+        self.assertEqual(len(self.runner), 0)
+
+    def test__key(self):
+        first = self.runner.execute(COUNTER, shell=True, cacheable=True)
+        self.assertIsNot(self.runner.execute(COUNTER, shell=True, cacheable=True, cwd="/"), first)
+        self.assertIsNot(self.runner.execute(COUNTER, shell=True, cacheable=True, env={"A": "1"}), first)
+        self.assertIs(self.runner.execute(COUNTER, shell=True, cacheable=True, timeout=10), first)
+
+    def test__ttl(self):
+        runner = CachingRunner(local, ttl=0.1)
+        first = runner.execute(COUNTER, shell=True, cacheable=True)
+        start_time = time()
+        while time() - start_time < 0.2:
+            pass
+        self.assertIsNot(runner.execute(COUNTER, shell=True, cacheable=True), first)
+
+    def test__lru(self):
+        runner = CachingRunner(local, max_entries=2)
+        first = runner.execute(["echo", "1"], cacheable=True)
+        runner.execute(["echo", "2"], cacheable=True)
+        runner.execute(["echo", "1"], cacheable=True)
+        runner.execute(["echo", "3"], cacheable=True)
+        self.assertEqual(len(runner), 2)
+        self.assertIs(runner.execute(["echo", "1"], cacheable=True), first)
+        self.assertEqual(runner.misses, 3)
+
+    def test__max_bytes(self):
+        runner = CachingRunner(local, max_bytes=10)
+        runner.execute(["echo", "12345678"], cacheable=True)
+        runner.execute(["echo", "123456789012"], cacheable=True)
+        self.assertEqual(len(runner), 1)
+        runner.execute(["echo", "1234"], cacheable=True)
+        self.assertEqual(len(runner), 1)
+
+    def test__invalidate(self):
+        first = self.runner.execute(COUNTER, shell=True, cacheable=True)
+        self.runner.invalidate(COUNTER, shell=True)
+        second = self.runner.execute(COUNTER, shell=True, cacheable=True)
+        self.assertIsNot(second, first)
+        self.runner.invalidate()
+        self.assertEqual(len(self.runner), 0)
+
+    def test__assert_success(self):
+        result = self.runner.execute(["false"], cacheable=True)
+        with self.assertRaises(ExecutionError) as caught:
+            self.runner.execute_assert_success(["false"], cacheable=True)
+        self.assertIs(caught.exception.result, result)
+
+    def test__single_flight(self):
+        results = []
+        def func():
+            results.append(self.runner.execute(["sleep", "0.5"], cacheable=True))
+        threads = [threading.Thread(target=func) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.runner.misses, 1)
+
+    def test__follower_timeout(self):
+        results = []
+        leader = threading.Thread(target=lambda: results.append(self.runner.execute(["sleep", "1"], cacheable=True)))
+        leader.start()
+        while not self.runner._flights:
+            pass
+        start_time = time()
+        with self.assertRaises(CommandTimeout):
+            self.runner.execute(["sleep", "1"], cacheable=True, timeout=0.3)
+        self.assertLess(time() - start_time, 0.6)
+        # the command keeps running for the leader
+        leader.join()
+        self.assertEqual(results[0].get_returncode(), 0)
@@ -0,0 +1,109 @@
+import os
+import sys
+import signal
+import select
+from time import time
+from .test_utils import TestCase, SkipTest
+from infi.execute import execute, execute_async, wait_for_many_results, result, child_exit
+
+
+class ChildExitTest(TestCase):
+    def setUp(self):
+        super(ChildExitTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def _assert_quick_wait(self, results):
+        start_time = time()
+        results = wait_for_many_results(results)
+        self.assertLess(time() - start_time, 1)
+        self.assertTrue(all(results))
+
+    def test__short_command_does_not_wait_for_sample_interval(self):
+        if child_exit.open_pidfd(os.getpid()) is None:
+            raise SkipTest("pidfd is not supported")
+        execute("true", shell=True)
+        start_time = time()
+        for _ in range(10):
+            execute("true", shell=True)
+        # with the sampling interval, this would have taken at least 10 * DEFAULT_SAMPLE_INTERVAL
+        self.assertLess(time() - start_time, 0.4)
+
+    def test__pidfd_open_through_ctypes(self):
+        if child_exit.open_pidfd(os.getpid()) is None:
+            raise SkipTest("pidfd is not supported")
+        original_pidfd_open = getattr(os, "pidfd_open", None)
+        if original_pidfd_open is not None:
+            # like python 3.8
+            del os.pidfd_open
+        try:
+            pidfd_open = child_exit._get_pidfd_open()
+        finally:
+            if original_pidfd_open is not None:
+                os.pidfd_open = original_pidfd_open
+        result = execute_async(["sleep", "0.1"])
+        pidfd = pidfd_open(result.get_pid())
+        try:
+            self.assertEqual(select.select([pidfd], [], [], 5)[0], [pidfd])
+        finally:
+            os.close(pidfd)
+        result.wait()
+
+    def test__results_with_pidfd(self):
+        results = [execute_async([sys.executable, "-c", "import time; time.sleep(0.1)"]) for _ in range(5)]
+        self._assert_quick_wait(results)
+
+    def test__results_without_pidfd(self):
+        original_open_pidfd = result.open_pidfd
+        result.open_pidfd = lambda pid: None
+        try:
+            results = [execute_async([sys.executable, "-c", "import time; time.sleep(0.1)"]) for _ in range(5)]
+        finally:
+            result.open_pidfd = original_open_pidfd
+        self.assertFalse(any(r.has_exit_notification() for r in results))
+        self._assert_quick_wait(results)
+        self.assertEqual(set(r.get_returncode() for r in results), set([0]))
+
+
+class SigchldWakeupTest(TestCase):
+    def test__subscribe(self):
+        wakeup = child_exit.sigchld_wakeup
+        read_fd = wakeup.subscribe()
+        if read_fd is None:
+            raise SkipTest("SIGCHLD handler can't be installed")
+        try:
+            execute("true", shell=True)
+            self.assertTrue(os.read(read_fd, 1))
+        finally:
+            wakeup.unsubscribe(read_fd)
+        # the pipe is kept for the next subscriber
+        read_fd = wakeup.subscribe()
+        wakeup.unsubscribe(read_fd)
+        self.assertEqual(wakeup.subscribe(), read_fd)
+        wakeup.unsubscribe(read_fd)
+
+    def test__handler_replaced(self):
+        wakeup = child_exit.sigchld_wakeup
+        read_fd = wakeup.subscribe()
+        if read_fd is None:
+            raise SkipTest("SIGCHLD handler can't be installed")
+        try:
+            # someone replaced our handler
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            other_read_fd = wakeup.subscribe()
+            # the handler is installed again
+            self.assertEqual(signal.getsignal(signal.SIGCHLD), wakeup._handle_signal)
+            wakeup.unsubscribe(other_read_fd)
+        finally:
+            wakeup.unsubscribe(read_fd)
+
+    def test__handler_removed_without_waiters(self):
+        original_open_pidfd = result.open_pidfd
+        result.open_pidfd = lambda pid: None
+        try:
+            start_time = time()
+            execute(["true"])
+            self.assertLess(time() - start_time, 2)
+        finally:
+            result.open_pidfd = original_open_pidfd
+        self.assertEqual(signal.getsignal(signal.SIGCHLD), signal.SIG_DFL)
@@ -0,0 +1,98 @@
+import os
+import sys
+from .test_utils import TestCase, SkipTest
+from infi.execute import execute, execute_async, CommandTimeout
+from infi.execute import events
+
+
+class _RecordingListener(events.Listener):
+    def __init__(self):
+        super(_RecordingListener, self).__init__()
+        self.events = []
+
+    def spawned(self, result):
+        self.events.append(("spawned",))
+
+    def first_byte(self, result, stream):
+        self.events.append(("first_byte", stream))
+
+    def chunk(self, result, stream, size):
+        self.events.append(("chunk", stream, size))
+
+    def exited(self, result):
+        self.events.append(("exited", result.get_returncode()))
+
+    def timed_out(self, result):
+        self.events.append(("timed_out",))
+
+    def killed(self, result, signal):
+        self.events.append(("killed", signal))
+
+
+class EventsTest(TestCase):
+    def setUp(self):
+        super(EventsTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        self.listener = _RecordingListener()
+        events.add_listener(self.listener)
+
+    def tearDown(self):
+        events.remove_listener(self.listener)
+        super(EventsTest, self).tearDown()
+
+    def test__events(self):
+        execute("echo hello", shell=True)
+        self.assertEqual(self.listener.events,
+                         [("spawned",), ("first_byte", "stdout"), ("chunk", "stdout", 6), ("exited", 0)])
+
+    def test__exited_once(self):
+        result = execute(["true"])
+        result.poll()
+        result.wait()
+        self.assertEqual([event for event in self.listener.events if event[0] == "exited"], [("exited", 0)])
+
+    def test__timeout_and_kill(self):
+        result = execute_async(["sleep", "100"], timeout=0.2)
+        with self.assertRaises(CommandTimeout):
+            result.wait()
+        result.kill()
+        self.assertEqual([event[0] for event in self.listener.events], ["spawned", "timed_out", "killed"])
+
+    def test__failing_listener(self):
+        class _FailingListener(events.Listener):
+            def spawned(self, result):
+                raise RuntimeError()
+        listener = _FailingListener()
+        events.add_listener(listener)
+        try:
+            self.assertEqual(execute(["true"]).get_returncode(), 0)
+        finally:
+            events.remove_listener(listener)
+
+    def test__metrics(self):
+        collector = events.MetricsCollector()
+        events.add_listener(collector)
+        try:
+            for _ in range(5):
+                execute([sys.executable, "-c", "print('x' * 100000)"])
+        finally:
+            events.remove_listener(collector)
+        self.assertEqual(collector.spawned_count, 5)
+        self.assertEqual(collector.exited_count, 5)
+        self.assertEqual(collector.wall_time.count, 5)
+        self.assertEqual(collector.first_byte_time.count, 5)
+        self.assertEqual(collector.chunk_size.total, 5 * 100001)
+        self.assertGreaterEqual(collector.wall_time.get_percentile(99), collector.wall_time.get_percentile(50))
+        self.assertLessEqual(collector.wall_time.get_percentile(100), collector.wall_time.max)
+
+
+class HistogramTest(TestCase):
+    def test__percentiles(self):
+        histogram = events.Histogram()
+        for value in [1, 2, 3, 100]:
+            histogram.add(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.get_mean(), 26.5)
+        self.assertEqual(histogram.get_percentile(50), 4)
+        self.assertEqual(histogram.get_percentile(100), 100)
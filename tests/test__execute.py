@@ -199,6 +199,43 @@ class ErrorExitTest(TestCase):
                 result.wait()
 
 
+class DrainTest(TestCase):
+    def setUp(self):
+        if os.name == 'nt':
+            raise test_utils.SkipTest("Not available on Windows")
+
+    def test__children_holding_the_pipes(self):
+        # the shell exits right away, the background sleep keeps its stdout open
+        with self.assertTakesAlmost(1, delta=0.8):
+            result = execute("echo hello; sleep 5 &", shell=True)
+        self.assertEqual(result.get_stdout(), b"hello\n")
+        self.assertEqual(result.get_output_pipes(), [])
+        with self.assertImmediate():
+            for _ in range(1000):
+                result.poll()
+
+    def test__output_after_exit_is_read(self):
+        result = execute("(sleep 0.2; echo late) &", shell=True)
+        self.assertEqual(result.get_stdout(), b"late\n")
+
+    def test__concurrent_drains(self):
+        results = [execute_async("echo hello; sleep 5 &", shell=True) for _ in range(10)]
+        # the pipes of all of the results are drained together by the ioloop
+        with self.assertTakesAlmost(1, delta=0.8):
+            wait_for_many_results(results)
+        self.assertEqual([result.get_stdout() for result in results], [b"hello\n"] * 10)
+
+    def test__poll_while_draining(self):
+        result = execute_async("echo hello; sleep 5 &", shell=True)
+        with self.assertImmediate():
+            while not result.has_exited():
+                sleep(0.01)
+            self.assertIsNone(result.poll())
+        while result.poll() is None:
+            sleep(0.01)
+        self.assertEqual(result.get_stdout(), b"hello\n")
+
+
 def is_gevent_importable():
     try:
         import gevent.subprocess
@@ -0,0 +1,47 @@
+import os
+from .test_utils import TestCase, SkipTest, FakeSSH
+from infi.execute import Fleet
+from infi.execute.fleet import OK, FAILED, TIMED_OUT, UNREACHABLE
+from infi.execute.ioloop import time
+
+
+class FleetTest(TestCase):
+    def setUp(self):
+        super(FleetTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        self.fake_ssh = FakeSSH()
+        self.ssh = self.fake_ssh.path
+
+    def tearDown(self):
+        self.fake_ssh.close()
+        super(FleetTest, self).tearDown()
+
+    def test__statuses(self):
+        fleet = Fleet(["good", "bad", "slow", "unreachable"], ssh_command=self.ssh)
+        command = lambda host: {"good": "echo hi", "bad": "exit 1", "slow": "sleep 100"}.get(host, "true")
+        start_time = time()
+        host_results = list(fleet.execute(command, timeout=0.5))
+        self.assertLess(time() - start_time, 5)
+        statuses = dict((host_result.host, host_result.status) for host_result in host_results)
+        self.assertEqual(statuses, dict(good=OK, bad=FAILED, slow=TIMED_OUT, unreachable=UNREACHABLE))
+        # the straggler comes last, the others don't wait for it
+        self.assertEqual(host_results[-1].host, "slow")
+        results = fleet.execute_all("echo hello")
+        self.assertEqual(results["good"].result.get_stdout(), b"hello\n")
+
+    def test__list_command(self):
+        fleet = Fleet(["host1", "host2"], ssh_command=self.ssh)
+        results = fleet.execute_all(["echo", "hello there"])
+        self.assertEqual(set(host_result.status for host_result in results.values()), set([OK]))
+        self.assertEqual(results["host1"].result.get_stdout(), b"hello there\n")
+
+    def test__limits(self):
+        hosts = ["host{0}".format(index) for index in range(6)]
+        fleet = Fleet(hosts, max_parallel=3, ssh_command=self.ssh)
+        start_time = time()
+        host_results = list(fleet.execute("sleep 0.3"))
+        # two rounds of three hosts
+        self.assertGreater(time() - start_time, 0.55)
+        self.assertEqual(sorted(host_result.host for host_result in host_results), hosts)
+        self.assertEqual(set(host_result.status for host_result in host_results), set([OK]))
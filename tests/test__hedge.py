@@ -0,0 +1,87 @@
+import os
+import signal
+from .test_utils import TestCase, SkipTest
+from infi.execute import events, HedgedExecutor, execute_hedged, ExecutionError, CommandTimeout
+from infi.execute.runner import LocalRunner
+from infi.execute.ioloop import time
+
+
+class HedgedExecutorTest(TestCase):
+    def setUp(self):
+        super(HedgedExecutorTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        self.primary, self.backup = LocalRunner(), LocalRunner()
+        self.started = []
+
+    def _command(self, primary, backup):
+        def get_command(runner):
+            self.started.append(runner)
+            return primary if runner is self.primary else backup
+        return get_command
+
+    def test__fast_primary(self):
+        result = execute_hedged([self.primary, self.backup], self._command("echo primary", "echo backup"), delay=5,
+                                shell=True)
+        self.assertEqual(result.get_stdout(), b"primary\n")
+        self.assertEqual(self.started, [self.primary])
+
+    def test__backup_wins(self):
+        start_time = time()
+        executor = HedgedExecutor([self.primary, self.backup], delay=0.2)
+        result = executor.execute(self._command("sleep 100", "echo backup"), shell=True)
+        self.assertLess(time() - start_time, 2)
+        self.assertEqual(result.get_stdout(), b"backup\n")
+        self.assertEqual(self.started, [self.primary, self.backup])
+        self.assertEqual(executor.hedged_count, 1)
+
+    def test__loser_is_killed(self):
+        killed = []
+        class Listener(events.Listener):
+            def killed(self, result, signal):
+                killed.append(result)
+        listener = Listener()
+        events.add_listener(listener)
+        try:
+            execute_hedged([self.primary, self.backup], self._command(["sleep", "100"], ["true"]), delay=0.2)
+        finally:
+            events.remove_listener(listener)
+        [loser] = killed
+        loser.wait()
+        self.assertEqual(loser.get_returncode(), -signal.SIGTERM)
+
+    def test__failed_primary_starts_the_backup_right_away(self):
+        start_time = time()
+        result = execute_hedged([self.primary, self.backup], self._command("false", "echo backup"), delay=5,
+                                shell=True)
+        self.assertLess(time() - start_time, 2)
+        self.assertEqual(result.get_stdout(), b"backup\n")
+
+    def test__failed_backup_starts_the_next_runner_right_away(self):
+        third = LocalRunner()
+        commands = {self.primary: "sleep 100", self.backup: "false", third: "echo third"}
+        start_time = time()
+        result = execute_hedged([self.primary, self.backup, third], lambda runner: commands[runner], delay=1,
+                                shell=True)
+        # the third runner started when the backup failed, not a delay later
+        self.assertLess(time() - start_time, 1.8)
+        self.assertEqual(result.get_stdout(), b"third\n")
+
+    def test__all_failed(self):
+        result = execute_hedged([self.primary, self.backup], ["false"])
+        self.assertEqual(result.get_returncode(), 1)
+        with self.assertRaises(ExecutionError):
+            execute_hedged([self.primary, self.backup], ["false"], assert_success=True)
+
+    def test__timeout(self):
+        start_time = time()
+        with self.assertRaises(CommandTimeout):
+            execute_hedged([self.primary, self.backup], ["sleep", "100"], delay=0.1, timeout=0.3)
+        self.assertLess(time() - start_time, 2)
+
+    def test__percentile_delay(self):
+        executor = HedgedExecutor([self.primary, self.backup], initial_delay=7)
+        self.assertEqual(executor.get_delay(), 7)
+        for _ in range(20):
+            executor.execute(["true"])
+        self.assertLess(executor.get_delay(), 1)
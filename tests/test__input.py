@@ -0,0 +1,61 @@
+import os
+import tempfile
+from io import BytesIO
+from .test_utils import TestCase, SkipTest
+from infi.execute import execute, execute_assert_success
+from infi.execute.input import FileInput
+
+DATA = b"".join(b"%08d\n" % i for i in range(300000))
+
+
+class InputTest(TestCase):
+    def setUp(self):
+        super(InputTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(DATA)
+
+    def tearDown(self):
+        os.remove(self.path)
+        super(InputTest, self).tearDown()
+
+    def _cat(self, stdin):
+        return execute_assert_success("cat", shell=True, stdin=stdin).get_stdout()
+
+    def test__bytes(self):
+        self.assertEqual(self._cat(DATA), DATA)
+
+    def test__input_size_multiple_of_chunk_size(self):
+        self.assertEqual(self._cat(b"a" * 2048), b"a" * 2048)
+
+    def test__file_path(self):
+        self.assertEqual(self._cat(FileInput(self.path)), DATA)
+
+    def test__file_object(self):
+        with open(self.path, "rb") as f:
+            self.assertEqual(self._cat(f), DATA)
+
+    def test__file_descriptor(self):
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            self.assertEqual(self._cat(fd), DATA)
+        finally:
+            os.close(fd)
+
+    def test__file_copy_fallback(self):
+        stdin = FileInput(self.path)
+        stdin._methods = [stdin._copy]
+        self.assertEqual(self._cat(stdin), DATA)
+
+    def test__iterable(self):
+        chunks = (DATA[i:i + 7000] for i in range(0, len(DATA), 7000))
+        self.assertEqual(self._cat(chunks), DATA)
+
+    def test__file_like_object(self):
+        self.assertEqual(self._cat(BytesIO(DATA)), DATA)
+
+    def test__process_does_not_read_its_input(self):
+        result = execute("true", shell=True, stdin=DATA)
+        self.assertEqual(result.get_returncode(), 0)
@@ -0,0 +1,173 @@
+import os
+import threading
+from .test_utils import TestCase, SkipTest
+from infi.execute import ioloop, waiting, execute_async, wait_for_many_results
+
+
+class PollerTestMixin(object):
+    poller_class = None
+
+    def setUp(self):
+        super(PollerTestMixin, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        self.ioloop = ioloop.IOLoop(self.poller_class())
+        self.pipes = []
+
+    def tearDown(self):
+        self.ioloop.close()
+        for fd in [fd for pipe in self.pipes for fd in pipe]:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        super(PollerTestMixin, self).tearDown()
+
+    def _pipe(self):
+        pipe = os.pipe()
+        self.pipes.append(pipe)
+        return pipe
+
+    def test__readable(self):
+        read_fd, write_fd = self._pipe()
+        called = []
+        self.ioloop.register_read(read_fd, lambda ioloop, f, count: called.append(os.read(f, 10)))
+        self.assertFalse(self.ioloop.do_iteration(0))
+        os.write(write_fd, b"hello")
+        self.assertTrue(self.ioloop.do_iteration(1))
+        self.assertEqual(called, [b"hello"])
+        # handlers stay registered until they unregister themselves
+        os.write(write_fd, b"world")
+        self.assertTrue(self.ioloop.do_iteration(1))
+        self.assertEqual(called, [b"hello", b"world"])
+
+    def test__writeable(self):
+        read_fd, write_fd = self._pipe()
+        called = []
+        self.ioloop.register_write(write_fd, lambda ioloop, f: called.append(f))
+        self.assertTrue(self.ioloop.do_iteration(1))
+        self.assertEqual(called, [write_fd])
+
+    def test__unregister(self):
+        read_fd, write_fd = self._pipe()
+        self.ioloop.register_read(read_fd, lambda ioloop, f, count: self.fail())
+        self.ioloop.do_iteration(0)
+        self.ioloop.unregister_read(read_fd)
+        os.write(write_fd, b"hello")
+        self.assertFalse(self.ioloop.do_iteration(0))
+
+    def test__unregister_from_handler(self):
+        read_fd, write_fd = self._pipe()
+        called = []
+        def handler(ioloop, f, count):
+            called.append(os.read(f, 1))
+            if called[-1] == b"c":
+                ioloop.unregister_read(f)
+        self.ioloop.register_read(read_fd, handler)
+        os.write(write_fd, b"abcd")
+        for _ in range(4):
+            self.ioloop.do_iteration(0.1)
+        self.assertEqual(called, [b"a", b"b", b"c"])
+
+    def test__flush(self):
+        read_fd, write_fd = self._pipe()
+        other_read_fd, _ = self._pipe()
+        called = []
+        def handler(ioloop, f, count):
+            data = os.read(f, 2)
+            called.append(data)
+            if not data:
+                ioloop.unregister_read(f)
+        self.ioloop.register_read(read_fd, handler)
+        self.ioloop.register_read(other_read_fd, lambda ioloop, f, count: self.fail())
+        os.write(write_fd, b"abc")
+        os.close(write_fd)
+        self.ioloop.flush([read_fd])
+        self.assertEqual(called, [b"ab", b"c", b""])
+
+    def test__closed_descriptor_reused(self):
+        read_fd, write_fd = self._pipe()
+        self.ioloop.register_read(read_fd, lambda ioloop, f, count: None)
+        self.ioloop.do_iteration(0)
+        self.ioloop.unregister_read(read_fd)
+        os.close(read_fd)
+        os.close(write_fd)
+        new_read_fd, new_write_fd = self._pipe()
+        called = []
+        self.ioloop.register_read(new_read_fd, lambda ioloop, f, count: called.append(os.read(f, 10)))
+        os.write(new_write_fd, b"hello")
+        self.assertTrue(self.ioloop.do_iteration(1))
+        self.assertEqual(called, [b"hello"])
+
+    def test__timers(self):
+        called = []
+        now = ioloop.time()
+        self.ioloop.call_at(now + 0.2, lambda: called.append("late"))
+        self.ioloop.call_at(now + 0.1, lambda: called.append("early"))
+        self.ioloop.call_at(now + 0.1, lambda: called.append("cancelled")).cancel()
+        # the iteration doesn't wait longer than the earliest timer
+        self.ioloop.do_iteration(10)
+        self.assertEqual(called, ["early"])
+        self.assertGreaterEqual(ioloop.time(), now + 0.1)
+        self.ioloop.do_iteration(10)
+        self.assertEqual(called, ["early", "late"])
+        self.assertLess(ioloop.time(), now + 1)
+
+    def test__many_descriptors(self):
+        if self.poller_class is ioloop.SelectPoller:
+            raise SkipTest("select is limited by FD_SETSIZE")
+        called = []
+        pipes = [self._pipe() for _ in range(1100)]
+        for read_fd, _ in pipes:
+            self.ioloop.register_read(read_fd, lambda ioloop, f, count: called.append(os.read(f, 10)))
+        os.write(pipes[-1][1], b"last")
+        self.assertTrue(self.ioloop.do_iteration(1))
+        self.assertEqual(called, [b"last"])
+
+
+class EpollPollerTest(PollerTestMixin, TestCase):
+    poller_class = ioloop.EpollPoller
+
+    def setUp(self):
+        if ioloop.epoll_unix is None:
+            raise SkipTest("epoll is not available")
+        super(EpollPollerTest, self).setUp()
+
+
+class PollPollerTest(PollerTestMixin, TestCase):
+    poller_class = ioloop.PollPoller
+
+    def setUp(self):
+        if ioloop.poll_unix is None:
+            raise SkipTest("poll is not available")
+        super(PollPollerTest, self).setUp()
+
+
+class SelectPollerTest(PollerTestMixin, TestCase):
+    poller_class = ioloop.SelectPoller
+
+
+class FanOutTest(TestCase):
+    def test__wait_for_more_than_fd_setsize(self):
+        if os.name == 'nt' or ioloop.get_default_poller_class() is ioloop.SelectPoller:
+            raise SkipTest("requires epoll or poll")
+        results = [execute_async(["true"]) for _ in range(400)]
+        results = wait_for_many_results(results)
+        self.assertEqual(set(result.get_returncode() for result in results), set([0]))
+
+
+class ThreadIOLoopTest(TestCase):
+    def test__loop_is_reused_and_released(self):
+        loops = []
+        def func():
+            ioloop = waiting.get_ioloop()
+            result = execute_async("echo hello", shell=True)
+            wait_for_many_results([result])
+            loops.append((ioloop, waiting.get_ioloop(), dict(ioloop._reads), dict(ioloop._writes)))
+        thread = threading.Thread(target=func)
+        thread.start()
+        thread.join()
+        [(ioloop, same_ioloop, reads, writes)] = loops
+        self.assertIs(ioloop, same_ioloop)
+        self.assertIsNot(ioloop, waiting.get_ioloop())
+        self.assertEqual((reads, writes), ({}, {}))
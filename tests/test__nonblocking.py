@@ -1,5 +1,6 @@
 from infi.execute import utils
 import os
+import sys
 from .test_utils import TestCase, SkipTest
 
 class NonblockingTest(TestCase):
@@ -15,3 +16,28 @@ class NonblockingTest(TestCase):
     def _is_blocking(self, f):
         return utils.is_blocking(f)
 
+
+    def test__readinto_without_retry(self):
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        fd_in, fd_out = os.pipe()
+        file_in = os.fdopen(fd_in, "rb")
+        utils.make_fd_non_blocking(fd_in)
+        buffer = bytearray(10)
+        self.assertIsNone(utils.non_blocking_readinto(file_in, memoryview(buffer), retry=False))
+        os.write(fd_out, b"hello")
+        self.assertEqual(utils.non_blocking_readinto(file_in, memoryview(buffer), retry=False), 5)
+        self.assertEqual(buffer[:5], b"hello")
+        os.close(fd_out)
+        self.assertEqual(utils.non_blocking_readinto(file_in, memoryview(buffer), retry=False), 0)
+        file_in.close()
+
+    def test__set_pipe_size(self):
+        if not sys.platform.startswith("linux"):
+            raise SkipTest("Available on Linux only")
+        fd_in, fd_out = os.pipe()
+        try:
+            self.assertGreaterEqual(utils.set_pipe_size(fd_in, 256 * 1024), 256 * 1024)
+        finally:
+            os.close(fd_in)
+            os.close(fd_out)
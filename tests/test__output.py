@@ -0,0 +1,142 @@
+import os
+import sys
+from .test_utils import TestCase, SkipTest
+from infi.execute import execute, execute_async, execute_assert_success, CommandTimeout, ExecutionError
+from infi.execute.output import LineSplitter, CaptureAll, HeadTail, MaxBytes, SpillToFile
+
+
+class LineSplitterTest(TestCase):
+    def _split(self, chunks):
+        lines = []
+        splitter = LineSplitter(lines.append)
+        for chunk in chunks:
+            splitter(chunk)
+        return lines
+
+    def test__split(self):
+        self.assertEqual(self._split([b"a\nb", b"c\n", b"d\ne\n", b"f", b""]),
+                         [b"a\n", b"bc\n", b"d\n", b"e\n", b"f", b""])
+
+    def test__no_newlines(self):
+        self.assertEqual(self._split([b"a", b"b", b"c", b""]), [b"abc", b""])
+
+
+class CaptureTest(TestCase):
+    def _write(self, policy, chunks):
+        buffer = policy.create_buffer()
+        for chunk in chunks:
+            buffer.write(chunk)
+        return buffer
+
+    def test__capture_all(self):
+        buffer = self._write(CaptureAll(), [b"abc", b"def"])
+        self.assertEqual(buffer.getvalue(), b"abcdef")
+        self.assertEqual(buffer.get_size(), 6)
+        self.assertEqual(buffer.get_preview(2, 1), (b"ab", 3, b"f"))
+
+    def test__capture_all_write_view(self):
+        buffer = CaptureAll().create_buffer()
+        with buffer.get_write_view(10) as view:
+            view[:3] = b"abc"
+        buffer.commit(3)
+        buffer.write(b"def")
+        self.assertEqual(buffer.getvalue(), b"abcdef")
+        # the final bytes are built once
+        self.assertIs(buffer.getvalue(), buffer.getvalue())
+        view = buffer.getbuffer()
+        self.assertEqual(view.tobytes(), b"abcdef")
+        # writes are still possible while a view is held
+        buffer.write(b"g" * 100)
+        self.assertEqual(view.tobytes(), b"abcdef")
+        self.assertEqual(buffer.getvalue(), b"abcdef" + b"g" * 100)
+
+    def test__max_bytes(self):
+        buffer = self._write(MaxBytes(4), [b"abc", b"def", b"ghi"])
+        self.assertEqual(buffer.getvalue(), b"abcd")
+        self.assertEqual(buffer.get_size(), 9)
+        self.assertEqual(buffer.get_dropped(), 5)
+
+    def test__head_tail(self):
+        buffer = self._write(HeadTail(2, 4), [b"abc", b"def", b"ghi", b"jk"])
+        self.assertEqual(buffer.getvalue(), b"abhijk")
+        self.assertEqual(buffer.get_dropped(), 5)
+        self.assertEqual(buffer.get_preview(1, 2), (b"a", 8, b"jk"))
+
+    def test__spill_to_file(self):
+        buffer = self._write(SpillToFile(4), [b"abc"])
+        self.assertIsNone(buffer.get_file())
+        buffer.write(b"def")
+        self.assertIsNotNone(buffer.get_file())
+        buffer.write(b"ghi")
+        self.assertEqual(buffer.getvalue(), b"abcdefghi")
+        self.assertEqual(buffer.get_preview(2, 2), (b"ab", 5, b"hi"))
+
+    def test__output_view(self):
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        result = execute([sys.executable, "-c", "import sys; sys.stdout.write('a' * 1000000)"])
+        view = result.get_stdout_view()
+        self.assertEqual(len(view), 1000000)
+        self.assertEqual(view.tobytes(), result.get_stdout())
+
+    def test__bounded_execution(self):
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        command = [sys.executable, "-c", "import sys; sys.stdout.write('a' * 1000000 + 'b' * 10)"]
+        result = execute(command, capture=HeadTail(10, 10))
+        self.assertEqual(result.get_stdout(), b"a" * 10 + b"b" * 10)
+        self.assertEqual(result.get_stdout_capture().get_size(), 1000010)
+
+    def test__truncated_exception_message(self):
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        command = [sys.executable, "-c", "import sys; sys.stdout.write('a' * 1000000); sys.exit(1)"]
+        with self.assertRaises(ExecutionError) as caught:
+            execute_assert_success(command)
+        self.assertLess(len(str(caught.exception)), 10000)
+        self.assertIn("bytes omitted", str(caught.exception))
+        self.assertEqual(len(caught.exception.result.get_stdout()), 1000000)
+
+
+class StreamingTest(TestCase):
+    def setUp(self):
+        super(StreamingTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def _command(self, script):
+        return [sys.executable, "-c", script]
+
+    def test__callbacks(self):
+        stdout, stderr = [], []
+        result = execute(self._command("import sys; sys.stdout.write('out'); sys.stderr.write('err')"),
+                         stdout_callback=stdout.append, stderr_callback=stderr.append)
+        self.assertEqual(b"".join(stdout), b"out")
+        self.assertEqual(b"".join(stderr), b"err")
+        # the empty chunk marks EOF
+        self.assertEqual(stdout[-1], b"")
+        self.assertEqual(result.get_stdout(), b"out")
+
+    def test__no_capture(self):
+        stdout = []
+        result = execute(self._command("print('x' * 100000)"), stdout_callback=stdout.append, capture_output=False)
+        self.assertEqual(result.get_stdout(), b"")
+        self.assertEqual(len(b"".join(stdout)), 100001)
+
+    def test__iter_lines_as_they_arrive(self):
+        script = "import sys, time\nfor i in range(3):\n    print(i)\n    sys.stdout.flush()\n    time.sleep(0.2)"
+        result = execute_async(self._command(script))
+        lines = []
+        for line in result.iter_stdout(lines=True):
+            lines.append(line)
+            # the process is still running while we get its output
+            self.assertIsNone(result.get_returncode())
+        self.assertEqual(lines, [b"0\n", b"1\n", b"2\n"])
+        result.wait()
+        self.assertEqual(result.get_returncode(), 0)
+
+    def test__iter_timeout(self):
+        result = execute_async("sleep 100", shell=True, timeout=0.5)
+        with self.assertRaises(CommandTimeout):
+            list(result.iter_stdout())
+        result.kill()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+from .test_utils import TestCase, SkipTest
+from infi.execute import (execute, pipeline, pipeline_async, pipeline_assert_success,
+                          DEVNULL, STDOUT, ExecutionError, CommandTimeout)
+
+
+class RedirectionTest(TestCase):
+    def setUp(self):
+        super(RedirectionTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def test__devnull(self):
+        result = execute("echo out; echo err >&2", shell=True, stdout=DEVNULL)
+        self.assertEqual(result.get_stdout(), b"")
+        self.assertEqual(result.get_stderr(), b"err\n")
+
+    def test__stderr_to_stdout(self):
+        result = execute("echo out; echo err >&2", shell=True, stderr=STDOUT)
+        self.assertEqual(result.get_stdout(), b"out\nerr\n")
+        self.assertEqual(result.get_stderr(), b"")
+
+    def test__file(self):
+        with tempfile.TemporaryFile() as f:
+            result = execute("echo hello", shell=True, stdout=f)
+            self.assertEqual(result.get_returncode(), 0)
+            f.seek(0)
+            self.assertEqual(f.read(), b"hello\n")
+
+
+class PipelineTest(TestCase):
+    def setUp(self):
+        super(PipelineTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def test__pipeline(self):
+        result = pipeline([["printf", "a\\nb\\nc\\n"], ["grep", "-v", "b"], ["wc", "-l"]])
+        self.assertEqual(result.get_returncodes(), [0, 0, 0])
+        self.assertEqual(result.get_stdout().strip(), b"2")
+        # the intermediate output is not captured
+        self.assertEqual([stage.get_stdout() for stage in result.get_results()], [b"", b"", result.get_stdout()])
+
+    def test__stdin(self):
+        data = b"x" * 1000000
+        result = pipeline([["cat"], ["cat"]], stdin=data)
+        self.assertEqual(result.get_stdout(), data)
+
+    def test__large_intermediate_output(self):
+        result = pipeline([["head", "-c", "100000000", "/dev/zero"], ["wc", "-c"]])
+        self.assertEqual(result.get_stdout().strip(), b"100000000")
+
+    def test__early_exit_of_downstream(self):
+        # "yes" gets SIGPIPE once "head" exits
+        result = pipeline([["yes"], ["head", "-n", "1"]], timeout=10)
+        self.assertEqual(result.get_stdout(), b"y\n")
+        self.assertEqual(result.get_returncode(), 0)
+
+    def test__assert_success(self):
+        with self.assertRaises(ExecutionError):
+            pipeline_assert_success([["echo", "a"], ["false"]])
+        # only the last stage counts without pipefail
+        pipeline_assert_success([["false"], ["true"]])
+        with self.assertRaises(ExecutionError) as caught:
+            pipeline_assert_success([["false"], ["true"]], pipefail=True)
+        self.assertEqual(caught.exception.result.get_returncode(), 1)
+
+    def test__stderr_of_stages(self):
+        result = pipeline(["echo a >&2", "echo b >&2"], shell=True)
+        self.assertEqual([stage.get_stderr() for stage in result.get_results()], [b"a\n", b"b\n"])
+
+    def test__timeout(self):
+        result = pipeline_async([["sleep", "100"], ["cat"]], timeout=0.5)
+        with self.assertRaises(CommandTimeout):
+            result.wait()
+        result.kill()
+
+    def test__missing_command(self):
+        with self.assertRaises(OSError):
+            pipeline([["sleep", "100"], ["/nonexistent"]])
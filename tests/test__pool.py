@@ -0,0 +1,82 @@
+import os
+from time import time, process_time
+from .test_utils import TestCase, SkipTest
+from infi.execute import local, execute_many, ExecutionPool, ExecutionError
+
+
+class _CountingRunner(object):
+    """ wraps the local runner and records how many commands run at once, per host """
+    def __init__(self, host, counter):
+        super(_CountingRunner, self).__init__()
+        self.host = host
+        self._counter = counter
+
+    def execute_async(self, *args, **kwargs):
+        self._counter.append(self.host)
+        return local.execute_async(*args, **kwargs)
+
+
+class PoolTest(TestCase):
+    def setUp(self):
+        super(PoolTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def test__completion_order(self):
+        commands = ["sleep 0.6; echo 0", "sleep 0.2; echo 1", "echo 2"]
+        results = list(execute_many(commands, shell=True))
+        self.assertEqual([result.get_stdout() for result in results], [b"2\n", b"1\n", b"0\n"])
+
+    def test__map_keeps_the_order(self):
+        commands = ["sleep 0.4; echo 0", "sleep 0.2; echo 1", "echo 2"]
+        results = list(local.map(commands, shell=True))
+        self.assertEqual([result.get_stdout() for result in results], [b"0\n", b"1\n", b"2\n"])
+
+    def test__max_parallel(self):
+        start_time = time()
+        results = list(execute_many(["sleep 0.2"] * 6, max_parallel=3, shell=True))
+        self.assertEqual(len(results), 6)
+        self.assertGreater(time() - start_time, 0.38)
+
+    def test__commands_are_consumed_lazily(self):
+        consumed = []
+
+        def commands():
+            for index in range(1000):
+                consumed.append(index)
+                yield ["true"]
+        results = execute_many(commands(), max_parallel=8)
+        next(results)
+        self.assertLessEqual(len(consumed), 9)
+        self.assertEqual(sum(1 for _ in results), 999)
+
+    def test__max_per_host(self):
+        started = []
+        pool = ExecutionPool(max_parallel=4, max_per_host=1)
+        for host in ["a", "a", "b", "b"]:
+            pool.submit(_CountingRunner(host, started), "sleep 0.2", shell=True)
+        start_time = time()
+        results = list(pool.as_completed())
+        self.assertEqual(len(results), 4)
+        # two rounds of two hosts in parallel
+        self.assertGreater(time() - start_time, 0.38)
+        self.assertLess(time() - start_time, 0.8)
+        self.assertEqual(started[:2], ["a", "b"])
+
+    def test__timeout_kills(self):
+        start_time = time()
+        results = list(execute_many([["sleep", "100"], ["echo", "hello"]], timeout=0.5))
+        self.assertLess(time() - start_time, 5)
+        self.assertEqual(results[0].get_stdout(), b"hello\n")
+        self.assertLess(results[1].get_returncode(), 0)
+
+    def test__killed_results_are_drained_without_spinning(self):
+        # the background sleeps outlive the killed shells and hold their pipes
+        start_cpu_time = process_time()
+        results = list(execute_many(["sleep 5 & sleep 5"] * 3, shell=True, timeout=0.3))
+        self.assertLess(process_time() - start_cpu_time, 0.5)
+        self.assertEqual([result.has_timed_out() for result in results], [True] * 3)
+
+    def test__assert_success(self):
+        with self.assertRaises(ExecutionError):
+            list(execute_many(["true", "false"], assert_success=True))
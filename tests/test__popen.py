@@ -32,16 +32,16 @@ class TestSSHPopen(PopenTest):
         self.ssh_runner = runner.through_ssh(self.host, base_runner=self.runner)
     def test__default_goes_to_local(self):
         self.forge.replace(runner, "local")
-        expected_result = runner.local.popen([self.SSH, self.host, "command"], shell=True).and_return(self.forge.create_sentinel())
+        expected_result = runner.local.popen("{0} {1} command".format(self.SSH, self.host), shell=True).and_return(self.forge.create_sentinel())
         with self.forge.verified_replay_context():
             result = runner.through_ssh(self.host).popen(["command"])
         self.assertIs(result, expected_result)
     def test__list_command(self):
-        self._test__popen_execution(["echo", "hello"], [self.SSH, self.host, "echo hello"])
+        self._test__popen_execution(["echo", "hello"], "{0} {1} \"echo hello\"".format(self.SSH, self.host))
     def test__string_command(self):
         self._test__popen_execution("echo hello", "{0} {1} \"echo hello\"".format(self.SSH, self.host))
     def test__list_command_with_quoting(self):
-        self._test__popen_execution(["echo", "hello there"], [self.SSH, self.host, "echo \"hello there\""])
+        self._test__popen_execution(["echo", "hello there"], "{0} {1} \"echo \\\"hello there\\\"\"".format(self.SSH, self.host))
     def test__string_command_with_quoting(self):
         self._test__popen_execution("echo \"hello there\"", "{0} {1} \"echo \\\"hello there\\\"\"".format(self.SSH, self.host))
     def _test__popen_execution(self, cmd, expected_translation):
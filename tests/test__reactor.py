@@ -0,0 +1,97 @@
+import os
+import signal
+import threading
+from concurrent import futures
+from .test_utils import TestCase, SkipTest
+from infi.execute import local, ExecutionError, CommandTimeout, KillPolicy
+from infi.execute.reactor import Reactor
+from infi.execute.ioloop import time
+
+
+class ReactorTest(TestCase):
+    def setUp(self):
+        super(ReactorTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        self.reactor = Reactor()
+
+    def tearDown(self):
+        self.reactor.close()
+        super(ReactorTest, self).tearDown()
+
+    def test__result(self):
+        future = self.reactor.submit(local.execute_async("echo out; echo err >&2; exit 3", shell=True))
+        result = future.result(timeout=5)
+        self.assertEqual(result.get_returncode(), 3)
+        self.assertEqual(result.get_stdout(), b"out\n")
+        self.assertEqual(result.get_stderr(), b"err\n")
+
+    def test__assert_success(self):
+        future = self.reactor.submit(local.execute_async(["false"], assert_success=True))
+        self.assertIsInstance(future.exception(timeout=5), ExecutionError)
+
+    def test__timeout(self):
+        result = local.execute_async(["sleep", "100"], timeout=0.2, kill_policy=KillPolicy(grace_period=1))
+        future = self.reactor.submit(result)
+        self.assertIsInstance(future.exception(timeout=5), CommandTimeout)
+        # the reactor applies the kill policy and reaps the process
+        deadline = time() + 5
+        while result.get_returncode() is None and time() < deadline:
+            pass
+        self.assertEqual(result.get_returncode(), -signal.SIGTERM)
+
+    def test__timeout_with_kill_policy(self):
+        # the deadline timer of the result may apply the kill policy before the reactor handles the deadline
+        results = [local.execute_async(["sleep", "100"], timeout=0.05, kill_policy=KillPolicy(grace_period=1))
+                   for _ in range(10)]
+        for future in [self.reactor.submit(result) for result in results]:
+            self.assertIsInstance(future.exception(timeout=5), CommandTimeout)
+
+    def test__callback_error(self):
+        def callback(chunk):
+            raise ValueError("callback")
+        failed = self.reactor.submit(local.execute_async(["echo", "hello"], stdout_callback=callback))
+        self.assertIsInstance(failed.exception(timeout=5), ValueError)
+        # the reactor keeps running
+        self.assertEqual(self.reactor.submit(local.execute_async(["true"])).result(timeout=5).get_returncode(), 0)
+
+    def test__thread_failure(self):
+        def fail(sigchld_fd):
+            raise RuntimeError("reactor")
+        self.reactor._get_sample_interval = fail
+        future = self.reactor.submit(local.execute_async(["sleep", "0.1"]))
+        self.assertIsInstance(future.exception(timeout=5), RuntimeError)
+        # the next submit starts a new thread
+        del self.reactor._get_sample_interval
+        self.assertEqual(self.reactor.submit(local.execute_async(["true"])).result(timeout=5).get_returncode(), 0)
+
+    def test__many_threads(self):
+        outputs = []
+        def func(index):
+            future = self.reactor.submit(local.execute_async(["echo", str(index)]))
+            outputs.append(future.result(timeout=10).get_stdout())
+        threads = [threading.Thread(target=func, args=(index,)) for index in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outputs), sorted("{0}\n".format(index).encode("ascii") for index in range(20)))
+
+    def test__as_completed(self):
+        slow = self.reactor.submit(local.execute_async(["sleep", "0.5"]))
+        fast = self.reactor.submit(local.execute_async(["true"]))
+        self.assertEqual(list(futures.as_completed([slow, fast], timeout=5)), [fast, slow])
+
+    def test__drains_dont_hold_the_other_results(self):
+        # the background sleeps hold the pipes for a second after the shells exit
+        draining = [self.reactor.submit(local.execute_async("echo hello; sleep 5 &", shell=True)) for _ in range(5)]
+        start_time = time()
+        fast = self.reactor.submit(local.execute_async(["true"]))
+        fast.result(timeout=5)
+        self.assertLess(time() - start_time, 0.5)
+        futures.wait(draining, timeout=5)
+        self.assertLess(time() - start_time, 3)
+        self.assertEqual([future.result().get_stdout() for future in draining], [b"hello\n"] * 5)
+
+    def test__runner_submit(self):
+        self.assertEqual(local.submit(["echo", "hello"]).result(timeout=5).get_stdout(), b"hello\n")
@@ -0,0 +1,140 @@
+import os
+import sys
+from .test_utils import TestCase, SkipTest
+from infi.execute import ExecutionError
+from infi.execute.runner import LocalRunner
+from infi.execute.spawn import POSIX_SPAWN, FORKSERVER, SpawnedProcess, ForkServer, ForkServerError
+
+
+class SpawnTestMixin(object):
+    def setUp(self):
+        super(SpawnTestMixin, self).setUp()
+        if os.name == 'nt' or not hasattr(os, "posix_spawnp"):
+            raise SkipTest("Not available on this platform")
+        self.runner = LocalRunner(self.spawn)
+
+    def tearDown(self):
+        self.runner.close()
+        super(SpawnTestMixin, self).tearDown()
+
+    def test__execute(self):
+        result = self.runner.execute("echo out; echo err >&2; exit 3", shell=True)
+        self.assertIsInstance(result._popen, SpawnedProcess)
+        self.assertEqual(result.get_returncode(), 3)
+        self.assertEqual(result.get_stdout(), b"out\n")
+        self.assertEqual(result.get_stderr(), b"err\n")
+
+    def test__stdin(self):
+        self.assertEqual(self.runner.execute(["cat"], stdin=b"x" * 1000000).get_stdout(), b"x" * 1000000)
+
+    def test__env(self):
+        result = self.runner.execute("echo $SPAWN_TEST", shell=True, env={"SPAWN_TEST": "hello"})
+        self.assertEqual(result.get_stdout(), b"hello\n")
+
+    def test__cwd(self):
+        self.assertEqual(self.runner.execute(["pwd"], cwd="/").get_stdout(), b"/\n")
+
+    def test__new_session(self):
+        command = [sys.executable, "-c", "import os; print(os.getsid(0) == os.getpid())"]
+        self.assertEqual(self.runner.execute(command, new_session=True).get_stdout(), b"True\n")
+        self.assertEqual(self.runner.execute(command).get_stdout(), b"False\n")
+
+    def test__missing_executable(self):
+        with self.assertRaises(OSError):
+            self.runner.execute(["/nonexistent"])
+
+    def test__kill(self):
+        result = self.runner.execute_async(["sleep", "100"])
+        result.kill()
+        result.wait()
+        self.assertLess(result.get_returncode(), 0)
+
+    def test__sigpipe_is_restored(self):
+        # "yes" has to be killed by SIGPIPE rather than fail writing to a closed pipe
+        result = self.runner.execute("yes | head -n 1", shell=True)
+        self.assertEqual(result.get_stdout(), b"y\n")
+        self.assertEqual(result.get_stderr(), b"")
+
+    def test__assert_success(self):
+        with self.assertRaises(ExecutionError):
+            self.runner.execute_assert_success(["false"])
+
+
+class PosixSpawnTest(SpawnTestMixin, TestCase):
+    spawn = POSIX_SPAWN
+
+
+class ForkServerTest(SpawnTestMixin, TestCase):
+    spawn = FORKSERVER
+
+    def test__bad_arguments(self):
+        with self.assertRaises(TypeError):
+            self.runner.execute(["true"], env={"SPAWN_TEST": None})
+        # the server survives the error
+        self.assertEqual(self.runner.execute(["echo", "hello"]).get_stdout(), b"hello\n")
+
+    def test__server_restarted(self):
+        process = self.runner._fork_server._process
+        process.kill()
+        process.wait()
+        self.assertEqual(self.runner.execute(["echo", "hello"]).get_stdout(), b"hello\n")
+        self.assertIsNot(self.runner._fork_server._process, process)
+
+    def test__sys_path(self):
+        # like the paths that the scripts buildout generates insert
+        path = "/nonexistent/infi-execute-test"
+        sys.path.append(path)
+        try:
+            server = ForkServer()
+            server.start()
+        finally:
+            sys.path.remove(path)
+        try:
+            environ_path = "/proc/{0}/environ".format(server._process.pid)
+            if not os.path.exists(environ_path):
+                raise SkipTest("/proc is not available")
+            with open(environ_path, "rb") as f:
+                environ = dict(item.split(b"=", 1) for item in f.read().split(b"\0") if item)
+            self.assertIn(path.encode("ascii"), environ[b"PYTHONPATH"].split(os.pathsep.encode("ascii")))
+        finally:
+            server.close()
+
+    def test__failed_start(self):
+        from infi.execute import spawn
+        command, spawn._SERVER_COMMAND = spawn._SERVER_COMMAND, "import sys; sys.exit(3)"
+        try:
+            with self.assertRaises(ForkServerError):
+                ForkServer().start()
+            # the runner falls back to Popen
+            runner = LocalRunner(FORKSERVER)
+        finally:
+            spawn._SERVER_COMMAND = command
+        result = runner.execute(["echo", "hello"])
+        self.assertNotIsInstance(result._popen, SpawnedProcess)
+        self.assertEqual(result.get_stdout(), b"hello\n")
+
+
+class SendFdsTest(TestCase):
+    def setUp(self):
+        super(SendFdsTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def test__send_fds(self):
+        import socket
+        from infi.execute.spawn import send_fds, recv_fds
+        left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        read_fd, write_fd = os.pipe()
+        try:
+            send_fds(left, b"hello", [write_fd])
+            data, fds = recv_fds(right, 1024, 4)
+            self.assertEqual(data, b"hello")
+            self.assertEqual(len(fds), 1)
+            os.write(fds[0], b"x")
+            os.close(fds[0])
+            self.assertEqual(os.read(read_fd, 1), b"x")
+        finally:
+            for f in (left, right):
+                f.close()
+            for fd in (read_fd, write_fd):
+                os.close(fd)
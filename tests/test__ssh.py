@@ -0,0 +1,48 @@
+import os
+from time import time
+from .test_utils import TestCase, SkipTest, FakeSSH
+from infi.execute import through_ssh
+
+
+class SSHRunnerTest(TestCase):
+    def setUp(self):
+        super(SSHRunnerTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+        self.fake_ssh = FakeSSH()
+        self.ssh = self.fake_ssh.path
+
+    def tearDown(self):
+        self.fake_ssh.close()
+        super(SSHRunnerTest, self).tearDown()
+
+    def test__multiplex(self):
+        with through_ssh("host", multiplex=True, ssh_command=self.ssh) as runner:
+            result = runner.execute_assert_success(["echo", "hello there"])
+            self.assertEqual(result.get_stdout(), b"hello there\n")
+            control_path, master, persist = self.fake_ssh.get_options()
+            self.assertEqual(master, "ControlMaster=auto")
+            self.assertEqual(persist, "ControlPersist=60")
+            control_dir = os.path.dirname(control_path.split("=", 1)[1])
+            self.assertTrue(os.path.isdir(control_dir))
+            self.assertTrue(runner.is_master_running())
+        self.assertEqual(self.fake_ssh.get_options()[-1], "exit")
+        self.assertFalse(os.path.exists(control_dir))
+
+    def test__max_sessions(self):
+        runner = through_ssh("host", max_sessions=2, ssh_command=self.ssh)
+        start_time = time()
+        results = [runner.execute_async("sleep 0.3; echo {0}".format(index)) for index in range(4)]
+        # the last two commands waited for the first two to exit
+        self.assertGreater(time() - start_time, 0.25)
+        for index, result in enumerate(results):
+            result.wait()
+            self.assertEqual(result.get_stdout(), "{0}\n".format(index).encode("ascii"))
+        self.assertGreater(time() - start_time, 0.55)
+
+    def test__batch(self):
+        for multiplex in (False, True):
+            with through_ssh("host", multiplex=multiplex, ssh_command=self.ssh) as runner:
+                results = runner.execute_batch(["echo $PPID", ["echo", "hello there"], "exit 4"])
+                self.assertEqual(results[1].get_stdout(), b"hello there\n")
+                self.assertEqual([result.get_returncode() for result in results], [0, 0, 4])
@@ -0,0 +1,46 @@
+import os
+import sys
+from .test_utils import TestCase, SkipTest
+from infi.execute import execute, execute_async, execute_many
+from infi.execute.input import FileInput
+from infi.execute.stats import summarize
+
+
+class StatsTest(TestCase):
+    def setUp(self):
+        super(StatsTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def test__stats(self):
+        script = "import sys; data = sys.stdin.buffer.read(); sys.stdout.write('x' * 1000); x = bytearray(50 * 1024 * 1024)"
+        result = execute([sys.executable, "-c", script], stdin=b"a" * 100000)
+        stats = result.get_stats()
+        self.assertEqual(stats.stdin_bytes, 100000)
+        self.assertEqual(stats.stdout_bytes, 1000)
+        self.assertEqual(stats.stderr_bytes, 0)
+        self.assertGreater(stats.spawn_time, 0)
+        self.assertGreater(stats.wall_time, stats.spawn_time)
+        self.assertGreater(stats.user_time + stats.system_time, 0)
+        self.assertGreater(stats.max_rss, 50 * 1024 * 1024)
+
+    def test__file_input_bytes(self):
+        result = execute(["cat"], stdin=FileInput(sys.executable))
+        self.assertEqual(result.get_stats().stdin_bytes, os.path.getsize(sys.executable))
+
+    def test__running(self):
+        result = execute_async(["sleep", "100"])
+        self.assertIsNone(result.get_stats().wall_time)
+        result.kill()
+
+    def test__summary(self):
+        results = list(execute_many(["true", "false", "sleep 0.2", "echo hello"], shell=True))
+        summary = summarize(results)
+        self.assertEqual(summary.count, 4)
+        self.assertEqual(summary.failed, 1)
+        self.assertEqual(summary.stdout_bytes, 6)
+        self.assertGreaterEqual(summary.max_wall_time, 0.2)
+        (slowest, stats), = summary.get_top("wall_time", 1)
+        self.assertEqual(slowest._command, "sleep 0.2")
+        self.assertEqual(len(summary.get_top("cpu_time")), 4)
+        self.assertIn("4 commands", repr(summary))
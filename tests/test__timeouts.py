@@ -0,0 +1,121 @@
+import os
+import errno
+import signal
+from .test_utils import TestCase, SkipTest
+from infi.execute import execute, execute_async, pipeline, wait_for_many_results, KillPolicy, CommandTimeout
+from infi.execute import result as result_module
+from infi.execute.ioloop import time, sleep
+from infi.execute.waiting import wait_for_any_exit
+
+SLEEPERS = "sleep 100 & sleep 100 & wait"
+# ignores SIGTERM, so only SIGKILL stops it
+STUBBORN = "trap '' TERM; echo ready; while true; do sleep 0.1; done"
+
+
+class KillPolicyTest(TestCase):
+    def setUp(self):
+        super(KillPolicyTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def test__without_policy_the_process_keeps_running(self):
+        with self.assertRaises(CommandTimeout) as caught:
+            execute(["sleep", "100"], timeout=0.1)
+        result = caught.exception.result
+        self.assertFalse(result.is_finished())
+        result.kill(signal.SIGKILL)
+        wait_for_any_exit([result])
+
+    def test__terminated_on_timeout(self):
+        start_time = time()
+        with self.assertRaises(CommandTimeout) as caught:
+            execute(["sleep", "100"], timeout=0.1, kill_policy=KillPolicy(grace_period=5))
+        self.assertLess(time() - start_time, 2)
+        self.assertEqual(caught.exception.result.get_returncode(), -signal.SIGTERM)
+
+    def test__killed_after_grace_period(self):
+        start_time = time()
+        with self.assertRaises(CommandTimeout) as caught:
+            execute(STUBBORN, shell=True, timeout=0.3, kill_policy=KillPolicy(grace_period=0.3))
+        self.assertGreaterEqual(time() - start_time, 0.6)
+        self.assertEqual(caught.exception.result.get_returncode(), -signal.SIGKILL)
+
+    def test__each_result_on_its_own_deadline(self):
+        policy = KillPolicy(grace_period=0)
+        short = execute_async(["sleep", "100"], timeout=0.1, kill_policy=policy)
+        long = execute_async(["sleep", "100"], timeout=0.5, kill_policy=policy)
+        done = execute_async(["sleep", "1"])
+        wait_for_many_results([done])
+        self.assertEqual(short.poll(), -signal.SIGTERM)
+        self.assertEqual(long.poll(), -signal.SIGTERM)
+        self.assertEqual(done.poll(), 0)
+
+    def test__kill_with_grace_period(self):
+        result = execute_async(STUBBORN, shell=True)
+        next(result.iter_stdout())
+        result.kill(grace_period=0.2)
+        result.wait()
+        self.assertEqual(result.get_returncode(), -signal.SIGKILL)
+
+    def test__timed_out_during_the_wait_without_pidfd(self):
+        # without a pidfd the process may be killed and reaped before the wait notices the deadline
+        original_open_pidfd = result_module.open_pidfd
+        result_module.open_pidfd = lambda pid: None
+        try:
+            for _ in range(3):
+                with self.assertRaises(CommandTimeout) as caught:
+                    execute(SLEEPERS, shell=True, new_session=True, timeout=0.2, kill_policy=KillPolicy(grace_period=5))
+                self.assertTrue(caught.exception.result.has_timed_out())
+                with self.assertRaises(CommandTimeout):
+                    pipeline([SLEEPERS, "cat"], shell=True, new_session=True, timeout=0.2,
+                             kill_policy=KillPolicy(grace_period=5))
+        finally:
+            result_module.open_pidfd = original_open_pidfd
+
+
+class NewSessionTest(TestCase):
+    def setUp(self):
+        super(NewSessionTest, self).setUp()
+        if os.name == 'nt':
+            raise SkipTest("Not available on Windows")
+
+    def _assert_process_is_gone(self, pid):
+        deadline = time() + 5
+        while time() < deadline:
+            try:
+                os.kill(pid, 0)
+            except OSError as error:
+                self.assertEqual(error.errno, errno.ESRCH)
+                return
+        self.fail("process {0} is still running".format(pid))
+
+    def test__kill_takes_down_the_children(self):
+        result = execute_async("sleep 100 & echo $!; wait", shell=True, new_session=True)
+        grandchild = int(next(result.iter_stdout(lines=True)))
+        result.kill()
+        # the grandchild held the output pipes, so this would block without killing the group
+        result.wait()
+        self.assertEqual(result.get_returncode(), -signal.SIGTERM)
+        self._assert_process_is_gone(grandchild)
+
+    def test__kill_policy_takes_down_the_children(self):
+        start_time = time()
+        with self.assertRaises(CommandTimeout) as caught:
+            execute("sleep 100 & sleep 100 & wait", shell=True, new_session=True, timeout=0.2,
+                    kill_policy=KillPolicy(grace_period=5))
+        result = caught.exception.result
+        # the pipes are closed once the children are gone
+        while result.poll() is None:
+            sleep(0.01)
+        self.assertLess(time() - start_time, 3)
+        self.assertEqual(result.get_returncode(), -signal.SIGTERM)
+        self.assertEqual(result.get_output_pipes(), [])
+
+
+class DeadlineTest(TestCase):
+    def test__exited_before_the_wait(self):
+        result = execute_async(["true"], timeout=0.2)
+        # the deadline passes before anyone handled the exit of the process
+        sleep(0.5)
+        self.assertTrue(result.wait())
+        self.assertEqual(result.get_returncode(), 0)
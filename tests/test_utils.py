@@ -1,5 +1,38 @@
+import os
+import stat
+import shutil
+import tempfile
 try:
     from unittest2 import TestCase, SkipTest
 except ImportError:
     from unittest import TestCase, SkipTest
 
+# logs the options, fails like ssh does for the unreachable hosts, and runs the command locally on the others
+_FAKE_SSH = """#!/bin/sh
+while [ "$1" = "-o" ]; do echo "$2" >> {log}; shift 2; done
+if [ "$1" = "-O" ]; then echo "$2" >> {log}; exit 0; fi
+case "$1" in {unreachable}*) echo "ssh: connect to host $1: Connection timed out" >&2; exit 255;; esac
+shift
+exec /bin/sh -c "$*"
+"""
+
+
+class FakeSSH(object):
+    """ a stand-in for ssh in a temporary directory, path is the ssh command to use. hosts that start with
+    unreachable fail to connect """
+    def __init__(self, unreachable="unreachable"):
+        super(FakeSSH, self).__init__()
+        self.directory = tempfile.mkdtemp()
+        self.log = os.path.join(self.directory, "log")
+        self.path = os.path.join(self.directory, "ssh")
+        with open(self.path, "w") as f:
+            f.write(_FAKE_SSH.format(log=self.log, unreachable=unreachable))
+        os.chmod(self.path, stat.S_IRWXU)
+
+    def get_options(self):
+        """ returns the -o options (and -O commands) that ssh got, in order """
+        with open(self.log) as f:
+            return f.read().splitlines()
+
+    def close(self):
+        shutil.rmtree(self.directory)